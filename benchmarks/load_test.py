@@ -0,0 +1,144 @@
+"""
+End-to-end load test of one Application against a local stand-in of the bot api.
+
+The bot runs with Application.run() in a child process and polls tuican.testing.FakeBotApiServer
+over HTTP. Simulated users send /start and then repeat a scenario of clicks and messages, every step
+waits for the message of the user to be sent or edited and for a click to be answered.
+Reports throughput and latency percentiles of the steps.
+
+run from the repository root:
+    python -m benchmarks.load_test [--example press_counter] [--users 100] [--duration 20]
+        [--latency 0.05] [--too-many-requests 0.01] [--concurrent-updates 64] [--rate-limit] [--debounce 0.1]
+"""
+import argparse
+import asyncio
+import importlib
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+
+from tuican.testing import FakeBotApiServer, UpdateFactory
+
+# screen, steps repeated after /start, every step has to change the message
+SCENARIOS = {
+    'press_counter': ("examples.press_counter:ButtonScreen", [("click", 0)]),
+    'components_showcase': ("examples.components_showcase:ComponentsScreen",
+                            [("click", 0), ("click", 1), ("click", 3), ("send", "42")]),
+    'multiple_screens': ("examples.multiple_screens:AppScreens", [("click", "Left"), ("click", "Back")]),
+    'dynamic_layout': ("examples.dynamic_layout:MainScreen",
+                       [("click", "right"), ("click", 0), ("click", "back"), ("click", "left")]),
+}
+STEP_TIMEOUT = 10.0
+
+
+def run_bot(screen: str, base_url: str, concurrent_updates: int, rate_limit: bool, debounce: float | None):
+    # runs in the child process
+    from tuican import Application
+    sys.stdout = open(os.devnull, "w")
+    module, _, name = screen.partition(":")
+    app = Application("0:load", {'start': getattr(importlib.import_module(module), name)}).base_url(base_url)
+    if concurrent_updates:
+        app.concurrent_updates(concurrent_updates)
+    if not rate_limit:
+        app.rate_limiter(None)
+    if debounce is not None:
+        app.debounce_callbacks(debounce)
+    app.run()
+
+
+class SimulatedUser:
+    def __init__(self, server: FakeBotApiServer, user_id: int):
+        self._server = server
+        self._updates = UpdateFactory(user_id)
+        self.user_id = user_id
+
+    async def step(self, action: str, argument: str | int):
+        if action == "send":
+            update = self._updates.message(argument)
+        else:
+            buttons = [b for row in self._server.api.keyboard_of(self.user_id) for b in row]
+            if isinstance(argument, int):
+                button = buttons[argument]
+            else:
+                button = next(b for b in buttons if b["text"] == argument)
+            message_id = self._server.api.last_message_ids[self.user_id]
+            update = self._updates.callback(button["callback_data"], message_id)
+        self._server.push_update(update)
+        # a click is done when the message changed and the button stopped loading
+        waits = [self._server.wait_for(self.user_id, timeout=STEP_TIMEOUT)]
+        if "callback_query" in update:
+            waits.append(self._server.wait_for_answer(update["callback_query"]["id"], timeout=STEP_TIMEOUT))
+        await asyncio.gather(*waits)
+
+    async def run(self, steps: list, deadline: float, latencies: list[float], errors: list[str], think: float):
+        try:
+            await self.step("send", "/start")
+            i = 0
+            while time.monotonic() < deadline:
+                if think:
+                    await asyncio.sleep(random.expovariate(1 / think))
+                start = time.monotonic()
+                await self.step(*steps[i % len(steps)])
+                latencies.append(time.monotonic() - start)
+                i += 1
+        except (TimeoutError, StopIteration, IndexError, KeyError) as e:
+            errors.append(type(e).__name__)
+
+
+def percentile(values: list[float], p: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1] if len(values) > 1 else values[0]
+
+
+async def load(args):
+    screen, steps = SCENARIOS[args.example]
+    server = await FakeBotApiServer(args.latency, args.too_many_requests, seed=1).start()
+    bot = multiprocessing.get_context("spawn").Process(
+        target=run_bot, args=(screen, server.base_url, args.concurrent_updates, args.rate_limit, args.debounce))
+    bot.start()
+    try:
+        await asyncio.wait_for(server.polling.wait(), 30)
+        latencies: list[float] = []
+        errors: list[str] = []
+        start = time.monotonic()
+        deadline = start + args.duration
+        users = [SimulatedUser(server, 1000 + i) for i in range(args.users)]
+        await asyncio.gather(*(user.run(steps, deadline, latencies, errors, args.think) for user in users))
+        elapsed = time.monotonic() - start
+    finally:
+        server.stop_polling()
+        bot.terminate()
+        await asyncio.to_thread(bot.join, 10)
+        if bot.is_alive():
+            bot.kill()
+        await server.stop()
+
+    print(f"example {args.example}, {args.users} users, latency {args.latency}s, "
+          f"429 share {args.too_many_requests}, rate limiter {'on' if args.rate_limit else 'off'}")
+    print(f"steps {len(latencies)} in {elapsed:.1f}s, {len(latencies) / elapsed:.1f} steps/s, "
+          f"failed users {len(errors)} {sorted(set(errors))}")
+    if latencies:
+        print("latency ms " + " ".join(f"p{p} {percentile(latencies, p) * 1000:.1f}" for p in (50, 95, 99))
+              + f" max {max(latencies) * 1000:.1f}")
+    print(f"injected 429 {server.throttled}, bot api calls " + ", ".join(
+        f"{endpoint} {count}" for endpoint, count in sorted(server.calls.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--example", choices=SCENARIOS.keys(), default="press_counter")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause between steps of a user in seconds")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--too-many-requests", type=float, default=0.0)
+    parser.add_argument("--concurrent-updates", type=int, default=64)
+    parser.add_argument("--rate-limit", action="store_true", help="keep the default OutboundScheduler")
+    parser.add_argument("--debounce", type=float, default=None, help="Application.debounce_callbacks window")
+    asyncio.run(load(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
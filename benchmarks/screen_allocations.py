@@ -0,0 +1,84 @@
+"""
+Allocations made by Application.get_or_create_screen for every dispatched update.
+
+Compares the eager lookup (the factory was called on every update and the
+result thrown away for existing sessions) with the lazy one, and shows the cost
+of a new session built by the screen class.
+
+run from the repository root:
+    python -m benchmarks.screen_allocations
+"""
+import asyncio
+import time
+import tracemalloc
+
+from telegram import Update
+
+from examples.components_showcase import ComponentsScreen
+from examples.deeplink import Grp
+from examples.dynamic_layout import MainScreen
+from examples.multiple_screens import AppScreens
+from examples.press_counter import ButtonScreen
+from tuican import Application, get_user_id
+from tuican.testing import UpdateFactory
+
+SCREENS = {
+    'press_counter': ButtonScreen,
+    'components_showcase': ComponentsScreen,
+    'dynamic_layout': MainScreen,
+    'multiple_screens': AppScreens,
+    'deeplink': Grp,
+}
+ITERATIONS = 2000
+USER_ID = 1
+
+
+class EagerLookupApplication(Application):
+    # get_or_create_screen before lazy construction, the factory ran on every lookup
+    async def get_or_create_screen(self, update, context, args=None):
+        self._screen_factories[self._commands[get_user_id(update)]]()
+        return await super().get_or_create_screen(update, context, args)
+
+
+def measure(function) -> tuple[float, float]:
+    """Returns mean peak bytes and microseconds per call."""
+    total_bytes = 0
+    tracemalloc.start()
+    for _ in range(ITERATIONS):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        function()
+        total_bytes += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        function()
+    elapsed = time.perf_counter() - start
+    return total_bytes / ITERATIONS, elapsed / ITERATIONS * 1e6
+
+
+def lookup(application_class: type[Application], factory) -> tuple[float, float]:
+    app = application_class("0:benchmark", {'start': factory})
+    app._commands[USER_ID] = 'start'
+    app.sessions.put(('start', USER_ID), factory())
+    update = Update.de_json(UpdateFactory(USER_ID).callback("data", 1), None)
+    loop = asyncio.new_event_loop()
+    try:
+        return measure(lambda: loop.run_until_complete(app.get_or_create_screen(update, None)))
+    finally:
+        loop.close()
+
+
+def main():
+    print(f"{'screen':<22}{'eager B/upd':>12}{'lazy B/upd':>12}{'eager µs':>10}{'lazy µs':>10}"
+          f"{'new B':>10}{'new µs':>10}")
+    for name, factory in SCREENS.items():
+        eager_bytes, eager_time = lookup(EagerLookupApplication, factory)
+        lazy_bytes, lazy_time = lookup(Application, factory)
+        new_bytes, new_time = measure(factory)
+        print(f"{name:<22}{eager_bytes:>12.0f}{lazy_bytes:>12.0f}{eager_time:>10.1f}{lazy_time:>10.1f}"
+              f"{new_bytes:>10.0f}{new_time:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Resident memory of a session for every example screen.
+
+Every session is built by the screen's factory and its layout is rendered once,
+as it stays in the session cache after the first display. Reports the bytes
+allocated per session as seen by tracemalloc and as estimated by SessionCache.
+
+run from the repository root:
+    python -m benchmarks.session_memory [--save FILE] [--baseline FILE] [--tolerance 0.1]
+
+--save writes the results as json, --baseline compares with saved results and
+exits with status 1 if a screen grew by more than the tolerance.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import sys
+import tracemalloc
+
+from examples.components_showcase import ComponentsScreen
+from examples.deeplink import Grp
+from examples.dynamic_layout import MainScreen
+from examples.hello_world import MyScreen
+from examples.multiple_screens import AppScreens
+from examples.paginated_list import RowsScreen
+from examples.press_counter import ButtonScreen
+from tuican.session import estimate_size
+
+SCREENS = {
+    'hello_world': MyScreen,
+    'press_counter': ButtonScreen,
+    'components_showcase': ComponentsScreen,
+    'dynamic_layout': MainScreen,
+    'multiple_screens': AppScreens,
+    'deeplink': Grp,
+    'paginated_list': RowsScreen,
+}
+SESSIONS = 1000
+
+
+async def create_sessions(factory, count: int) -> list:
+    sessions = [factory() for _ in range(count)]
+
+    async def render(screen):
+        screen._reuse_rows(await screen.get_layout(None, None))
+
+    await asyncio.gather(*(render(screen) for screen in sessions))
+    # let background work such as page prefetch settle
+    await asyncio.sleep(0.1)
+    return sessions
+
+
+def measure(factory, count: int) -> tuple[float, float]:
+    """Returns traced and estimated bytes per session."""
+    loop = asyncio.new_event_loop()
+    try:
+        # first run warms up class level caches and imports
+        loop.run_until_complete(create_sessions(factory, 1))
+        gc.collect()
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        sessions = loop.run_until_complete(create_sessions(factory, count))
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        loop.close()
+    return (after - before) / count, estimate_size(sessions[0])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=SESSIONS)
+    parser.add_argument("--save")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    results = {}
+    regressions = []
+    print(f"{'screen':<22}{'traced B':>10}{'estimated B':>13}{'baseline B':>12}")
+    for name, factory in SCREENS.items():
+        traced, estimated = measure(factory, args.sessions)
+        results[name] = round(traced)
+        previous = baseline.get(name)
+        print(f"{name:<22}{traced:>10.0f}{estimated:>13.0f}{previous if previous is not None else '-':>12}")
+        if previous is not None and traced > previous * (1 + args.tolerance):
+            regressions.append(name)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if regressions:
+        print(f"memory per session grew by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Framework overhead per update for every example screen, without network.
+
+Each example runs a scripted scenario of clicks and messages through Application with
+tuican.testing.RecordingRequest as bot api transport and no rate limiter, so the
+numbers are dispatching, screen code, rendering and the bot api calls made by PTB.
+paginated_list is left out, its example provider sleeps on every fetch.
+
+run from the repository root:
+    python -m benchmarks.update_overhead [--updates 2000]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+import tracemalloc
+
+from examples.components_showcase import ComponentsScreen
+from examples.deeplink import Grp
+from examples.dynamic_layout import MainScreen
+from examples.hello_world import MyScreen
+from examples.multiple_screens import AppScreens
+from examples.press_counter import ButtonScreen
+from tuican import Application
+from tuican.testing import OfflineRunner, RecordingRequest
+
+
+def click(button: str | int):
+    return lambda runner: runner.click(button)
+
+
+def send(text: str):
+    return lambda runner: runner.send(text)
+
+
+# screen, steps repeated in a loop after /start
+SCENARIOS = {
+    'hello_world': (MyScreen, [click(0)]),
+    'press_counter': (ButtonScreen, [click(0)]),
+    'components_showcase': (ComponentsScreen, [click(0), click(1), click(2), click(3), send("42")]),
+    'dynamic_layout': (MainScreen, [click("right"), click(0), click("back"), click("left")]),
+    'multiple_screens': (AppScreens, [click("Left"), click("Back"), click("Right"), click("Left"), click("Home")]),
+    'deeplink': (Grp, [send("/start 123"), click("❌ cancel")]),
+}
+UPDATES = 2000
+
+
+async def measure(screen, steps, updates: int) -> tuple[float, float, float]:
+    """Returns mean µs, mean peak bytes and bot api calls per update."""
+    request = RecordingRequest(record=False)
+    runner = OfflineRunner(Application("0:benchmark", {'start': screen}).rate_limiter(None), request)
+    await runner.start()
+    try:
+        await runner.send("/start")
+        for step in steps:
+            await step(runner)
+
+        start = time.perf_counter()
+        for i in range(updates):
+            await steps[i % len(steps)](runner)
+        elapsed = time.perf_counter() - start
+
+        total_bytes = 0
+        tracemalloc.start()
+        for i in range(updates):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            await steps[i % len(steps)](runner)
+            total_bytes += tracemalloc.get_traced_memory()[1] - current
+        tracemalloc.stop()
+
+        request.record = True
+        for step in steps:
+            await step(runner)
+        api_calls = len(request.calls)
+    finally:
+        await runner.stop()
+    return elapsed / updates * 1e6, total_bytes / updates, api_calls / len(steps)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=UPDATES)
+    args = parser.parse_args()
+    print(f"{'screen':<22}{'µs/upd':>10}{'B/upd':>10}{'calls/upd':>11}")
+    for name, (screen, steps) in SCENARIOS.items():
+        # examples print on clicks
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            micros, allocated, calls = asyncio.run(measure(screen, steps, args.updates))
+        print(f"{name:<22}{micros:>10.1f}{allocated:>10.0f}{calls:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ from telegram import InlineKeyboardButton, Update
 from telegram.ext import ContextTypes
 
 from tuican import Application, get_user_id
-from tuican.components import Button, CheckBox, Component, ExclusiveCheckBoxGroup, Hline, Input, Screen
+from tuican.components import Button, CheckBox, Component, ExclusiveCheckBoxGroup, Hline, Input, Screen, SharedComponent
 from tuican.validation import positive_int
 
 
@@ -37,17 +37,19 @@ class ComponentsScreen(Screen):
 
 class SecondScreen(Screen):
     description: ClassVar[str] = 'second screen'
+    hline = SharedComponent(Hline(callback_data="hline"))
+
     def __init__(self):
-        self.hline = Hline()
-        super().__init__([self.hline], message="second screen")
+        super().__init__([], message="second screen")
 
     async def get_layout(self, update, context) -> Sequence[Sequence[InlineKeyboardButton]]:
         return [[self.hline.render(update, context)]]
 
 
 
-load_dotenv()
-token = os.getenv("token")
+if __name__ == "__main__":
+    load_dotenv()
+    token = os.getenv("token")
 
-app = Application(token, {'start': ComponentsScreen, 'second': SecondScreen})
-app.run()
+    app = Application(token, {'start': ComponentsScreen, 'second': SecondScreen})
+    app.run()
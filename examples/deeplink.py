@@ -6,9 +6,10 @@ from dotenv import load_dotenv
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from src.tuican.application import Application
-from src.tuican.components import Button, Screen
+from tuican.application import Application
+from tuican.components import Button, Screen
 from tuican.components import ScreenGroup
+from tuican.deadlines import deadline
 
 '''
 open https://t.me/<bot name>?start=123
@@ -44,6 +45,7 @@ class DeepLinkScreen(Screen):
         self.cancel = Button("❌ cancel", on_change=self.handle_cancel)
         super().__init__([self.action, self.cancel], message="perform action?")
 
+    @deadline(1.0)
     async def handle_action(self, update, context, callback_data, component):
         await self.send_message(update, context, f"action performed with argument {self.arg}")
         await self.group.go_home(update, context)
@@ -60,7 +62,8 @@ class Grp(ScreenGroup):
         main = MyScreen(self)
         super().__init__(main)
 
-load_dotenv()
-token = os.getenv("token")
-app = Application(token, {'start': Grp})
-app.run()
+if __name__ == "__main__":
+    load_dotenv()
+    token = os.getenv("token")
+    app = Application(token, {'start': Grp})
+    app.run()
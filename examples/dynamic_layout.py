@@ -60,7 +60,7 @@ class ButtonScreen(Screen):
         self.group = group
         super().__init__([self.back], message=message)
 
-    def get_layout(self, update, context) -> Sequence[Sequence[InlineKeyboardButton]]:
+    async def get_layout(self, update, context) -> Sequence[Sequence[InlineKeyboardButton]]:
         return [[self.back.render(update, context)]]
 
     async def go_back(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str, comp: Component):
@@ -73,8 +73,9 @@ class MainScreen(ScreenGroup):
         super().__init__(self.home)
 
 
-load_dotenv()
-token = os.getenv("token")
+if __name__ == "__main__":
+    load_dotenv()
+    token = os.getenv("token")
 
-app = Application(token, {'start': MainScreen})
-app.run()
+    app = Application(token, {'start': MainScreen})
+    app.run()
@@ -4,8 +4,8 @@ from typing import ClassVar
 from dotenv import load_dotenv
 
 from examples.dynamic_layout import MainScreen
-from src.tuican.application import Application
-from src.tuican.components import Button, Screen
+from tuican.application import Application
+from tuican.components import Button, Screen
 
 class MyScreen(Screen):
     description: ClassVar[str] = 'main screen'
@@ -19,7 +19,8 @@ class MyScreen(Screen):
     async def get_layout(self, update, context):
         return [[self.button.render(update, context)]]
 
-load_dotenv()
-token = os.getenv("token")
-app = Application(token, {'start': MainScreen})
-app.run()
+if __name__ == "__main__":
+    load_dotenv()
+    token = os.getenv("token")
+    app = Application(token, {'start': MainScreen})
+    app.run()
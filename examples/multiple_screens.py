@@ -5,24 +5,23 @@ from dotenv import load_dotenv
 from telegram import InlineKeyboardButton, Update
 from telegram.ext import ContextTypes
 
-from src.tuican import Application
-from src.tuican.components import Button, Component, Screen, ScreenGroup
+from tuican import Application
+from tuican.components import Button, Component, Screen, ScreenGroup, SharedComponent
 
 
 class NavigationScreen(Screen):
+    # navigation buttons are the same for every user, one instance serves all sessions
+    left_btn = SharedComponent(Button("Left", callback_data="left"), on_change="go_left")
+    right_btn = SharedComponent(Button("Right", callback_data="right"), on_change="go_right")
+    home_btn = SharedComponent(Button("Home", callback_data="home"), on_change="go_home")
+    back_btn = SharedComponent(Button("Back", callback_data="back"), on_change="go_back")
+
     def __init__(self, group: ScreenGroup, name: str, left_screen=None, right_screen=None):
         self.group = group
         self.name = name
         self.left_screen = left_screen
         self.right_screen = right_screen
-
-        self.left_btn = Button("Left", callback_data="left", on_change=self.go_left)
-        self.right_btn = Button("Right", callback_data="right", on_change=self.go_right)
-        self.home_btn = Button("Home", callback_data="home", on_change=self.go_home)
-        self.back_btn = Button("Back", callback_data="back", on_change=self.go_back)
-
-        super().__init__([self.left_btn, self.right_btn, self.home_btn, self.back_btn],
-                         message=f"Screen {name}")
+        super().__init__([], message=f"Screen {name}")
 
     async def get_layout(self, update, context) -> Sequence[Sequence[InlineKeyboardButton]]:
         buttons = []
@@ -60,7 +59,8 @@ class AppScreens(ScreenGroup):
         super().__init__(self.a)
 
 
-load_dotenv()
-token = os.getenv("token")
-app = Application(token, {'start': AppScreens})
-app.run()
+if __name__ == "__main__":
+    load_dotenv()
+    token = os.getenv("token")
+    app = Application(token, {'start': AppScreens})
+    app.run()
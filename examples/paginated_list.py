@@ -0,0 +1,44 @@
+import asyncio
+import os
+from typing import ClassVar, Sequence
+
+from dotenv import load_dotenv
+from telegram import InlineKeyboardButton, Update
+from telegram.ext import ContextTypes
+
+from tuican import Application
+from tuican.components import Component, PaginatedList, Screen
+
+
+async def fetch_rows(offset: int, limit: int) -> list[int]:
+    # emulates a database query over 100k rows
+    await asyncio.sleep(0.05)
+    return list(range(offset, min(offset + limit, 100_000)))
+
+
+# module level, so sessions with the list can be persisted
+def row_label(row: int) -> str:
+    return f"row {row}"
+
+
+class RowsScreen(Screen):
+    description: ClassVar[str] = 'paginated list'
+
+    def __init__(self):
+        self.rows = PaginatedList[int](fetch_rows, label=row_label, page_size=8, columns=2,
+                                       on_change=self.select_row)
+        super().__init__([self.rows], message="choose a row")
+
+    def select_row(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str, component: Component):
+        self.message = f"row {callback_data} selected"
+
+    async def get_layout(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Sequence[
+        Sequence[InlineKeyboardButton]]:
+        return await self.rows.render_rows(update, context)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    token = os.getenv("token")
+    app = Application(token, {'start': RowsScreen})
+    app.run()
@@ -5,8 +5,8 @@ from dotenv import load_dotenv
 from telegram import InlineKeyboardButton, Update
 from telegram.ext import ContextTypes
 
-from src.tuican import Application
-from src.tuican.components import Button, Component, Screen
+from tuican import Application
+from tuican.components import Button, Component, Screen
 
 
 class ButtonScreen(Screen):
@@ -24,9 +24,10 @@ class ButtonScreen(Screen):
         return [[self.b.render(update, context)]]
 
 
-load_dotenv()
-token = os.getenv("token")
-main_screen = ButtonScreen()
+if __name__ == "__main__":
+    load_dotenv()
+    token = os.getenv("token")
+    main_screen = ButtonScreen()
 
-app = Application(token, {'start': ButtonScreen})
-app.run()
+    app = Application(token, {'start': ButtonScreen})
+    app.run()
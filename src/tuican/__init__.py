@@ -1 +1,2 @@
-from .application import  Application, get_user_id
\ No newline at end of file
+from .application import  Application, get_user_id
+from .acknowledge import toast
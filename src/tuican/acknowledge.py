@@ -0,0 +1,74 @@
+import asyncio
+import logging
+
+from telegram import CallbackQuery, Update
+from telegram.error import TelegramError
+
+logger = logging.getLogger(__name__)
+
+# callback query id -> acknowledgement of the query being processed
+_pending: dict[str, "CallbackAck"] = dict()
+
+
+class CallbackAck:
+    """
+    Answers a callback query as soon as the handler sets a toast, the handler finishes
+    or the delay expires, whatever comes first, so the client stops showing the spinner.
+    """
+
+    def __init__(self, query: CallbackQuery):
+        self._query = query
+        self._text: str | None = None
+        self._show_alert = False
+        self._ready = asyncio.Event()
+        self._answered = False
+
+    def set_toast(self, text: str, show_alert: bool = False) -> bool:
+        if self._answered:
+            return False
+        self._text = text
+        self._show_alert = show_alert
+        self._ready.set()
+        return True
+
+    def release(self):
+        self._ready.set()
+
+    async def answer(self, delay: float):
+        try:
+            await asyncio.wait_for(self._ready.wait(), delay)
+        except TimeoutError:
+            pass
+        self._answered = True
+        try:
+            await self._query.answer(text=self._text, show_alert=self._show_alert)
+        except TelegramError as e:
+            # query is too old or was answered already
+            logger.warning("callback query was not answered: %s", e, extra={
+                "user_id": self._query.from_user.id, "error": type(e).__name__})
+
+    def __enter__(self):
+        _pending[self._query.id] = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _pending.pop(self._query.id, None)
+        self.release()
+
+
+def toast(update: Update, text: str, show_alert: bool = False) -> bool:
+    """
+    Show a notification to the user who pressed the button.
+    Returns False if the callback query was already answered.
+    """
+    query = update.callback_query
+    ack = _pending.get(query.id) if query is not None else None
+    return ack is not None and ack.set_toast(text, show_alert)
+
+
+def release(update: Update):
+    """Called when the handler is done, the query is answered without waiting for the delay."""
+    query = update.callback_query
+    ack = _pending.get(query.id) if query is not None else None
+    if ack is not None:
+        ack.release()
@@ -1,13 +1,31 @@
-from typing import Any, Callable, Coroutine
+import asyncio
+import logging
+import signal
+import time
+from typing import Any, Callable, Coroutine, Hashable
 
-from telegram import BotCommand, Update
-from telegram.ext import Application as TgApplication, ApplicationBuilder, CallbackQueryHandler, \
+from telegram import Bot, BotCommand, Update
+from telegram.ext import Application as TgApplication, ApplicationBuilder, BaseRateLimiter, CallbackQueryHandler, \
     CommandHandler, ContextTypes, \
-    MessageHandler, filters
+    MessageHandler, TypeHandler, filters
+from telegram.request import BaseRequest
 
-from .components import Screen
+from . import acknowledge
+from .acknowledge import CallbackAck
+from .components import Screen, render_stats
 from .components.screen import StartScreenProtocol
+from .deadlines import Deferred, pop_deferred
 from .errors import ValidationError
+from .httpserver import start_http_server
+from .journal import UpdateJournal
+from .log import QueueLogging
+from .metrics import HANDLER_ERRORS, InstrumentedRateLimiter, SCREEN_LOOKUP_SECONDS, Sample, metrics
+from .outbound import OutboundScheduler
+from .scheduling import SessionScheduler, get_session_key
+from .session import EvictionReason, SessionCache, SessionKey, SessionPersistence
+from .webhook import WebhookServer
+
+logger = logging.getLogger(__name__)
 
 
 def get_user_id(update: Update):
@@ -18,35 +36,295 @@ def get_user_id(update: Update):
     raise RuntimeError("no user id")
 
 
+def _log_failure(e: Exception, update: Update, screen: Screen, started: float):
+    query = update.callback_query
+    logger.error("update handling failed: %s", e, exc_info=e, extra={
+        "user_id": get_user_id(update),
+        "screen": type(screen).__name__,
+        "callback_data": query.data if query is not None else None,
+        "latency": time.perf_counter() - started,
+        "error": type(e).__name__,
+    })
+
+
 class Application:
-    def __init__(self, token: str, screens: dict[str, StartScreenProtocol]):
+    def __init__(self, token: str, screens: dict[str, StartScreenProtocol], sessions: SessionCache | None = None):
         self._app_builder = ApplicationBuilder().token(token)
         self._app = None
-        self._user_screens: dict[tuple[str, int], Screen] = dict()
+        self._user_screens = sessions if sessions is not None else SessionCache()
         self._screen_factories = screens
-        self._command = None
+        # user id -> command of the screen the user currently interacts with, forgotten with the session
+        self._commands: dict[int, str] = dict()
+        self._user_screens.on_evict(self._session_evicted)
+        self._scheduler = SessionScheduler()
+        self._rate_limiter: BaseRateLimiter | None = OutboundScheduler()
+        self._ack_delay = 0.2
+        self._drop_duplicate_callbacks = True
+        self._debounce: float | None = None
+        # message -> (callbacks waiting for the debounce window to pass, set when they are handled,
+        # arrivals of the session when the batch was started)
+        self._batches: dict[Hashable, tuple[list[tuple[Update, ContextTypes.DEFAULT_TYPE]], asyncio.Event, int]] = \
+            dict()
+        # (message, callback data) of presses being processed
+        self._callbacks_in_flight: set[Hashable] = set()
+        # user id -> handlers that missed their deadline and run in the background
+        self._deferred: dict[int, list[Deferred]] = dict()
+        # tasks displaying screens when their deferred handlers are done
+        self._finishers: set[asyncio.Task] = set()
+        self._webhook: WebhookServer | None = None
+        self._persistence: SessionPersistence | None = None
+        self._journal: UpdateJournal | None = None
+        self._metrics_address: tuple[str, int] | None = None
+        self._metrics_server: asyncio.Server | None = None
+        self._logging: QueueLogging | None = QueueLogging()
         self._post_init = None
         self._post_shutdown = None
 
     def _build(self):
-        async def wrapper(application: TgApplication):
-            await application.bot.set_my_commands(
-                [BotCommand(c, s.description) for c, s in self._screen_factories.items()])
-            if self._post_init:
-                await self._post_init(application)
-
-        if self._post_shutdown:
-            self._app_builder.post_shutdown(self._post_shutdown)
-        self._app_builder.post_init(wrapper)
+        self._app_builder.post_init(self._on_post_init)
+        self._app_builder.post_shutdown(self._on_post_shutdown)
+        if metrics.enabled:
+            self._app_builder.rate_limiter(InstrumentedRateLimiter(self._rate_limiter))
+        elif self._rate_limiter is not None:
+            self._app_builder.rate_limiter(self._rate_limiter)
         self._app = self._app_builder.build()
+        if self._journal is not None:
+            # before any other handler, also in ShardedApplication
+            self._app.add_handler(TypeHandler(Update, self._record_update), group=-1)
+        self._add_handlers()
+
+    def _add_handlers(self):
         self._app.add_handler(CommandHandler(self._screen_factories.keys(), self.command_handler))
         self._app.add_handler(CallbackQueryHandler(self.dispatcher, pattern=".*"))
         self._app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.message_dispatcher))
 
+    async def _on_post_init(self, application: TgApplication):
+        await application.bot.set_my_commands(
+            [BotCommand(c, s.description) for c, s in self._screen_factories.items()])
+        await self._start_services(application)
+
+    async def _start_services(self, application: TgApplication):
+        if self._logging:
+            await self._logging.start()
+        if self._persistence:
+            self._persistence.check_screens(self._screen_factories)
+            await self._persistence.start()
+        if self._journal:
+            await self._journal.start()
+        if metrics.enabled:
+            metrics.add_collector(self._collect_metrics)
+            if self._metrics_address is not None:
+                self._metrics_server = await start_http_server(metrics.handle, *self._metrics_address)
+        if self._post_init:
+            await self._post_init(application)
+
+    async def _on_post_shutdown(self, application: TgApplication):
+        for user_id in list(self._deferred):
+            self._cancel_deferred(user_id)
+        if self._finishers:
+            await asyncio.wait(self._finishers)
+        if self._persistence:
+            await self._persistence.stop()
+        if self._journal:
+            await self._journal.stop()
+        if self._metrics_server is not None:
+            self._metrics_server.close()
+            self._metrics_server = None
+        metrics.remove_collector(self._collect_metrics)
+        if self._post_shutdown:
+            await self._post_shutdown(application)
+        if self._logging:
+            await self._logging.stop()
+
     def run(self):
         self._build()
         self._app.run_polling(allowed_updates=Update.ALL_TYPES)
 
+    def run_webhook(self,
+                    listen: str = "127.0.0.1",
+                    port: int = 8443,
+                    url_path: str = "/",
+                    webhook_url: str | None = None,
+                    secret_token: str | None = None,
+                    max_queue_size: int = 1000,
+                    enqueue_timeout: float = 10.0):
+        """
+        Receive updates with a webhook instead of polling.
+
+        The server speaks plain HTTP, TLS is expected to be terminated by a load balancer or reverse proxy.
+        If webhook_url is given it is registered with telegram on start, otherwise the webhook has to be
+        set up separately, which allows testing by posting update JSON to the server locally.
+        Updates are buffered in a queue of max_queue_size, see WebhookServer for backpressure.
+        """
+        self._app_builder.update_queue(asyncio.Queue(max_queue_size)).updater(None)
+        self._build()
+        self._webhook = WebhookServer(self._app, url_path, secret_token, enqueue_timeout)
+        asyncio.run(self._serve_webhook(listen, port, webhook_url, secret_token))
+
+    async def _serve_webhook(self, listen: str, port: int, webhook_url: str | None, secret_token: str | None):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for stop_signal in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(stop_signal, stop.set)
+        await self._app.initialize()
+        if self._app.post_init:
+            await self._app.post_init(self._app)
+        if webhook_url is not None:
+            await self._app.bot.set_webhook(webhook_url, allowed_updates=Update.ALL_TYPES, secret_token=secret_token)
+        server = await self._webhook.start(listen, port)
+        await self._app.start()
+        try:
+            await stop.wait()
+        finally:
+            server.close()
+            server.close_clients()
+            await self._app.stop()
+            await self._app.shutdown()
+            if self._app.post_shutdown:
+                await self._app.post_shutdown(self._app)
+
+    async def serve_updates(self, receive: Callable[[], Coroutine[Any, Any, dict | None]]):
+        """
+        Process updates received as JSON dicts from an external source until it returns None.
+        Used by worker processes of ShardedApplication, bot commands are not registered.
+        """
+        await self.start()
+        try:
+            while (data := await receive()) is not None:
+                await self._app.update_queue.put(Update.de_json(data, self._app.bot))
+        finally:
+            await self.stop()
+
+    async def start(self):
+        """
+        Start without fetching updates, they are passed to process_update or update_queue by the caller.
+        Bot commands are not registered.
+        """
+        self._app_builder.updater(None)
+        self._build()
+        await self._app.initialize()
+        await self._start_services(self._app)
+        await self._app.start()
+
+    async def stop(self):
+        await self._app.stop()
+        await self._app.shutdown()
+        await self._on_post_shutdown(self._app)
+
+    async def process_update(self, update: Update | dict):
+        """Handle an update, or its JSON dict, and wait until handlers finish."""
+        if isinstance(update, dict):
+            update = Update.de_json(update, self._app.bot)
+        await self._app.process_update(update)
+
+    @property
+    def bot(self) -> Bot:
+        return self._app.bot
+
+    @property
+    def webhook(self) -> WebhookServer | None:
+        return self._webhook
+
+    def concurrent_updates(self, concurrent_updates: bool | int):
+        # updates of one user are still processed one by one, see SessionScheduler
+        self._app_builder.concurrent_updates(concurrent_updates)
+        return self
+
+    def acknowledge_callbacks(self, delay: float = 0.2, drop_duplicates: bool = True):
+        """
+        Callback queries are answered concurrently with handling, as soon as a toast is set,
+        the handler finishes or the delay expires.
+        Presses of a button that already has one in flight are answered and dropped if drop_duplicates.
+        """
+        self._ack_delay = delay
+        self._drop_duplicate_callbacks = drop_duplicates
+        return self
+
+    def debounce_callbacks(self, window: float | None = 0.15):
+        """
+        Callbacks for one message that arrive within window seconds of the first one are handled together,
+        one after another, and the screen is displayed once, so a burst of clicks costs a single edit.
+        Other updates of the user wait for the batch, a press arriving after one of them starts a new batch.
+        Replaces dropping of duplicate callbacks, None turns debouncing off.
+        """
+        self._debounce = window
+        return self
+
+    def persistence(self, persistence: SessionPersistence | None):
+        self._persistence = persistence
+        return self
+
+    def journal(self, journal: UpdateJournal | None):
+        # incoming updates are appended to the journal, see python -m tuican.replay
+        self._journal = journal
+        return self
+
+    async def _record_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        self._journal.record(update)
+
+    def logging(self, queue_logging: QueueLogging | None):
+        # QueueLogging is used by default, None leaves the "tuican" logger to the logging configuration of the bot
+        self._logging = queue_logging
+        return self
+
+    def metrics(self, port: int | None = None, host: str = "127.0.0.1"):
+        """
+        Enable instrumentation, see tuican.metrics. Metrics are process wide, metrics.snapshot() returns them
+        and if port is given they are served in Prometheus text format on http://host:port/metrics.
+        """
+        metrics.enabled = True
+        self._metrics_address = (host, port) if port is not None else None
+        return self
+
+    def _collect_metrics(self) -> list[Sample]:
+        sessions = self._user_screens.stats
+        samples: list[Sample] = [
+            ("tuican_sessions_resident", "gauge", {}, sessions.resident_sessions),
+            ("tuican_sessions_resident_bytes", "gauge", {}, sessions.resident_bytes),
+            ("tuican_session_lookups_total", "counter", {"result": "hit"}, sessions.hits),
+            ("tuican_session_lookups_total", "counter", {"result": "miss"}, sessions.misses),
+            ("tuican_session_evictions_total", "counter", {}, sessions.evictions),
+            ("tuican_edits_total", "counter", {"result": "sent"}, render_stats.edits_sent),
+            ("tuican_edits_total", "counter", {"result": "saved"}, render_stats.edits_saved),
+        ]
+        if isinstance(self._rate_limiter, OutboundScheduler):
+            outbound = self._rate_limiter.stats
+            samples += [
+                ("tuican_outbound_queue_depth", "gauge", {}, outbound.queue_depth),
+                ("tuican_outbound_sent_total", "counter", {}, outbound.sent),
+                ("tuican_outbound_coalesced_total", "counter", {}, outbound.coalesced),
+                ("tuican_outbound_retries_total", "counter", {}, outbound.retries),
+            ]
+        if self._webhook is not None:
+            webhook = self._webhook.stats
+            samples += [
+                ("tuican_webhook_received_total", "counter", {}, webhook.received),
+                ("tuican_webhook_rejected_total", "counter", {}, webhook.rejected),
+                ("tuican_webhook_queue_size", "gauge", {}, webhook.queue_size),
+            ]
+        if self._persistence is not None:
+            samples.append(("tuican_persistence_pending", "gauge", {}, self._persistence.pending))
+        return samples
+
+    def request(self, request: BaseRequest):
+        # transport of bot api requests, e.g. tuican.testing.RecordingRequest to run without network
+        self._app_builder.request(request).get_updates_request(request)
+        return self
+
+    def base_url(self, base_url: str):
+        # bot api server, the token is appended, e.g. tuican.testing.FakeBotApiServer.base_url
+        self._app_builder.base_url(base_url)
+        return self
+
+    def rate_limiter(self, rate_limiter: BaseRateLimiter | None):
+        # OutboundScheduler is used by default, None sends requests unthrottled
+        self._rate_limiter = rate_limiter
+        return self
+
+    @property
+    def outbound(self) -> BaseRateLimiter | None:
+        return self._rate_limiter
+
     def post_shutdown(self, function: Callable[[TgApplication], Coroutine[Any, Any, None]]):
         self._post_shutdown = function
         return self
@@ -57,57 +335,283 @@ class Application:
 
     async def handle_exception(self, e: Exception, update: Update, context: ContextTypes.DEFAULT_TYPE):
         chat_id = update.effective_chat.id
-        print(e)
+        metrics.inc(HANDLER_ERRORS, type(e).__name__)
         await context.bot.send_message(chat_id=chat_id, text=str(e))
 
     async def command_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        self.remove_current_screen(update)
-        command_args = update.message.text.replace('/', '').split(' ')
-        self._command = command_args[0]
-        screen = await self.get_or_create_screen(update, context, command_args)
-        screen.clear_update()
-        await screen.start_handler(update, context)
-
+        async with self._scheduler.serialize(get_session_key(update)):
+            self._cancel_deferred(get_user_id(update))
+            self.remove_current_screen(update)
+            command_args = update.message.text.replace('/', '').split(' ')
+            self._set_command(get_user_id(update), command_args[0])
+            try:
+                screen = await self.get_or_create_screen(update, context, command_args)
+                screen.clear_update()
+                await screen.start_handler(update, context)
+                await self._defer(update, context, screen)
+            finally:
+                self._discard_deferred(context)
+            self._session_changed(update, screen)
 
     async def dispatcher(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        screen = await self.get_or_create_screen(update, context)
+        query = update.callback_query
+        message_key = query.inline_message_id or (query.message.chat.id, query.message.message_id)
+        if self._debounce is not None:
+            await self._debounced_dispatch(message_key, update, context)
+            return
+        # presses of other buttons of the message are queued as usual
+        press_key = (message_key, query.data)
+        if self._drop_duplicate_callbacks and press_key in self._callbacks_in_flight:
+            await query.answer()
+            return
+        self._callbacks_in_flight.add(press_key)
         try:
-            if await screen.dispatcher(update, context):
-                await screen.display(update, context)
-        except Exception as e:
-            await self.handle_exception(e, update, context)
+            with CallbackAck(query) as ack:
+                answer = asyncio.create_task(ack.answer(self._ack_delay))
+                async with self._scheduler.serialize(get_session_key(update)):
+                    await self._dispatch(update, context)
+            # before the answer, a click after it is not a duplicate
+            self._callbacks_in_flight.discard(press_key)
+            await answer
+        finally:
+            self._callbacks_in_flight.discard(press_key)
+
+    async def _debounced_dispatch(self, message_key: Hashable, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        session_key = get_session_key(update)
+        batch = self._batches.get(message_key)
+        # a press joins the batch only if no other update of the user arrived since the batch started,
+        # the leader keeps the user's place in line while the window passes
+        leader = batch is None or batch[2] != self._scheduler.arrivals(session_key)
+        if leader:
+            batch = self._batches[message_key] = ([], asyncio.Event(), self._scheduler.arrivals(session_key) + 1)
+        updates, handled, _ = batch
+        updates.append((update, context))
+        with CallbackAck(update.callback_query) as ack:
+            answer = asyncio.create_task(ack.answer(self._ack_delay))
+            if leader:
+                try:
+                    async with self._scheduler.serialize(session_key):
+                        try:
+                            await asyncio.sleep(self._debounce)
+                        finally:
+                            # later callbacks start the next batch
+                            if self._batches.get(message_key) is batch:
+                                del self._batches[message_key]
+                        await self._dispatch_batch(updates)
+                finally:
+                    handled.set()
+            else:
+                await handled.wait()
+        await answer
+
+    async def _dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        await self._dispatch_batch([(update, context)])
+
+    async def _dispatch_batch(self, batch: list[tuple[Update, ContextTypes.DEFAULT_TYPE]]):
+        # callbacks of one message, they change the screen one by one and it is displayed once
+        started = time.perf_counter()
+        try:
+            screen, displayed = await self._get_or_create_screen(*batch[0])
+        except BaseException:
+            self._discard_deferred(batch[0][1])
+            raise
+        if displayed:
+            # the pressed buttons belong to the lost session, the fresh screen doesn't get them
+            for update, context in batch:
+                acknowledge.release(update)
+                self._discard_deferred(context)
+            self._session_changed(batch[-1][0], screen)
+            return
+        display = None
+        for update, context in batch:
+            try:
+                handled = await screen.dispatcher(update, context)
+                acknowledge.release(update)
+                self._cancel_deferred(get_user_id(update), keep=screen.active_screen)
+                if await self._defer(update, context, screen):
+                    display = None
+                elif handled:
+                    display = (update, context)
+            except Exception as e:
+                _log_failure(e, update, screen, started)
+                await self.handle_exception(e, update, context)
+            finally:
+                self._discard_deferred(context)
+        if display is not None and screen.dirty:
+            try:
+                await screen.display(*display)
+            except Exception as e:
+                _log_failure(e, display[0], screen, started)
+                await self.handle_exception(e, *display)
+        self._session_changed(batch[-1][0], screen)
 
     async def message_dispatcher(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        screen = await self.get_or_create_screen(update, context)
+        async with self._scheduler.serialize(get_session_key(update)):
+            await self._dispatch_message(update, context)
+
+    async def _dispatch_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        started = time.perf_counter()
+        try:
+            screen, displayed = await self._get_or_create_screen(update, context)
+        except BaseException:
+            self._discard_deferred(context)
+            raise
+        if displayed:
+            # the message was meant for an input of the lost session
+            self._discard_deferred(context)
+            self._session_changed(update, screen)
+            return
         chat_id = update.effective_chat.id
         try:
             if await screen.message_dispatcher(update, context):
                 message_id_to_delete = update.message.id
-                await screen.display(update, context)
+                self._cancel_deferred(get_user_id(update), keep=screen.active_screen)
+                deferred = await self._defer(update, context, screen)
+                if screen.dirty and not deferred:
+                    await screen.display(update, context)
                 await context.bot.delete_message(chat_id=chat_id, message_id=message_id_to_delete)
         except ValidationError as e:
             await context.bot.send_message(chat_id=chat_id, text=str(e))
         except Exception as e:
+            _log_failure(e, update, screen, started)
             await self.handle_exception(e, update, context)
+        finally:
+            self._discard_deferred(context)
+        self._session_changed(update, screen)
+
+    async def _defer(self, update: Update, context: ContextTypes.DEFAULT_TYPE, screen: Screen) -> bool:
+        # handlers that missed their deadline finish in the background, the message shows a placeholder until then
+        deferred = pop_deferred(context)
+        if not deferred:
+            return False
+        user_id = get_user_id(update)
+        owner = screen.active_screen
+        for handler in deferred:
+            handler.owner = owner
+            self._deferred.setdefault(user_id, []).append(handler)
+            handler.task.add_done_callback(lambda _, handler=handler: self._forget_deferred(user_id, handler))
+        # waits for the session, so it displays after the placeholder
+        finisher = asyncio.create_task(self._finish_deferred(update, context, screen, deferred))
+        self._finishers.add(finisher)
+        finisher.add_done_callback(self._finishers.discard)
+        await owner.display_placeholder(update, context, deferred[0].placeholder)
+        return True
+
+    async def _finish_deferred(self, update: Update, context: ContextTypes.DEFAULT_TYPE, screen: Screen,
+                               deferred: list[Deferred]):
+        started = time.perf_counter()
+        await asyncio.wait([handler.task for handler in deferred])
+        finished = [handler.task for handler in deferred if not handler.task.cancelled()]
+        errors = [task.exception() for task in finished if task.exception() is not None]
+        user_id = get_user_id(update)
+        async with self._scheduler.serialize(get_session_key(update)):
+            if not finished or self._user_screens.get((self._commands.get(user_id), user_id)) is not screen:
+                return
+            try:
+                # the placeholder is replaced even if the handler failed
+                screen.mark_dirty()
+                await screen.display(update, context)
+                if errors:
+                    raise errors[0]
+            except Exception as e:
+                _log_failure(e, update, screen, started)
+                await self.handle_exception(e, update, context)
+            self._session_changed(update, screen)
+
+    @staticmethod
+    def _discard_deferred(context: ContextTypes.DEFAULT_TYPE):
+        # handlers deferred by an update that failed, or wasn't dispatched, aren't waited for
+        for handler in pop_deferred(context):
+            handler.task.cancel()
+
+    def _cancel_deferred(self, user_id: int, keep: Screen | None = None):
+        # handlers of screens the user navigated away from are stale
+        for handler in self._deferred.get(user_id, ()):
+            if handler.owner is not keep:
+                handler.task.cancel()
+
+    def _forget_deferred(self, user_id: int, handler: Deferred):
+        handlers = self._deferred.get(user_id)
+        if handlers is not None and handler in handlers:
+            handlers.remove(handler)
+            if not handlers:
+                del self._deferred[user_id]
 
     async def get_or_create_screen(self, update: Update, context: ContextTypes.DEFAULT_TYPE, args=None):
-        not_initiated = self._command is None
-        if not_initiated:
-            print("command is empty. possible press on button after restart. start will be shown")
-            self._command = 'start'
+        screen, _ = await self._get_or_create_screen(update, context, args)
+        return screen
+
+    async def _get_or_create_screen(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                    args=None) -> tuple[Screen, bool]:
+        # True if a fresh screen was displayed instead of the session the update was meant for
+        started = time.perf_counter()
         user_id = get_user_id(update)
-        factory = self._screen_factories[self._command]
-        key = (self._command, user_id)
-        screen = self._user_screens.get(key, factory())
-        if key not in self._user_screens:
-            self._user_screens[key] = screen
-            await screen.command_handler(args if args is not None else [], update, context)
+        command = self._commands.get(user_id)
+        if command is None and self._persistence is not None:
+            command = await self._persistence.load_command(user_id)
+            if command in self._screen_factories:
+                self._commands[user_id] = command
+            else:
+                command = None
+        not_initiated = command is None
         if not_initiated:
+            logger.info("command is empty, possibly a button pressed after restart, start is shown",
+                        extra={"user_id": user_id})
+            command = 'start'
+            self._set_command(user_id, command)
+        factory = self._screen_factories[command]
+        key = (command, user_id)
+        screen = self._user_screens.get(key)
+        # commands always start a new session, callbacks and messages continue the saved one
+        if screen is None and self._persistence is not None and args is None:
+            screen = await self._persistence.load_screen(key)
+            if screen is not None:
+                self._user_screens.put(key, screen)
+        created = screen is None
+        if created:
+            # the lookup may have expired the session together with the command
+            self._commands[user_id] = command
+            screen = factory()
+            self._user_screens.put(key, screen)
+            await screen.command_handler(args if args is not None else [], update, context)
+        # a callback or message for an evicted session gets a fresh screen, its buttons belong to the old one
+        displayed = not_initiated or (created and args is None)
+        if displayed:
             await screen.display(update, context)
-        return screen
+        if metrics.enabled:
+            metrics.observe(SCREEN_LOOKUP_SECONDS, (type(screen).__name__,), time.perf_counter() - started)
+        return screen, displayed
 
     def remove_current_screen(self, update: Update):
         user_id = get_user_id(update)
-        key = (self._command, user_id)
-        if key in self._user_screens:
-            del self._user_screens[key]
+        command = self._commands.get(user_id)
+        if command is not None:
+            self._user_screens.pop((command, user_id))
+            if self._persistence is not None:
+                self._persistence.screen_removed((command, user_id))
+
+    def _set_command(self, user_id: int, command: str):
+        self._commands[user_id] = command
+        if self._persistence is not None:
+            self._persistence.command_changed(user_id, command)
+
+    def _session_changed(self, update: Update, screen: Screen):
+        user_id = get_user_id(update)
+        command = self._commands.get(user_id)
+        if command is None:
+            # evicted meanwhile by updates of other users
+            return
+        key = (command, user_id)
+        self._user_screens.resize(key)
+        # the session is written to the store with the next flush
+        if self._persistence is not None:
+            self._persistence.screen_changed(key, screen)
+
+    def _session_evicted(self, key: SessionKey, screen: Screen, reason: EvictionReason):
+        command, user_id = key
+        if self._commands.get(user_id) == command:
+            del self._commands[user_id]
+
+    @property
+    def sessions(self) -> SessionCache:
+        return self._user_screens
@@ -1,9 +1,11 @@
-from .button import Button
+from .button import Button, ParametricButton
 from .checkbox import CheckBox, ExclusiveCheckBoxGroup
-from .component import Component, MessageHandlingComponent
+from .component import Component, MessageHandlingComponent, ParametricComponent
 from .input import Input
-from .screen import Screen, ScreenGroup, StartScreenProtocol
+from .paginated_list import FunctionProvider, IteratorProvider, PageProvider, PaginatedList
+from .screen import RenderStats, Screen, ScreenGroup, StartScreenProtocol, render_stats
 from .hline import Hline
+from .shared import SharedComponent
 
 __all__ = [
     'Button',
@@ -15,5 +17,14 @@ __all__ = [
     'Screen',
     'ScreenGroup',
     'Hline',
-    'StartScreenProtocol'
+    'StartScreenProtocol',
+    'ParametricComponent',
+    'ParametricButton',
+    'PaginatedList',
+    'PageProvider',
+    'FunctionProvider',
+    'IteratorProvider',
+    'RenderStats',
+    'render_stats',
+    'SharedComponent'
 ]
\ No newline at end of file
@@ -1,10 +1,15 @@
 from telegram import InlineKeyboardButton, Update
 from telegram.ext import ContextTypes
 
-from .component import CallBack, Component
+from .component import CallBack, Component, ParametricComponent
 
 
 class Button(Component):
+    __slots__ = ("_text",)
+    state_fields = Component.state_fields + ("_text",)
+    routed_by_callback_data = True
+    tracks_changes = True
+
     def __init__(
             self,
             text: str = "",
@@ -26,10 +31,12 @@ class Button(Component):
         return True
 
     def render(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> InlineKeyboardButton:
-        return InlineKeyboardButton(
-            self._text,
-            callback_data=self.callback_data
-        )
+        if self._rendered is None:
+            self._rendered = InlineKeyboardButton(
+                self._text,
+                callback_data=self.callback_data
+            )
+        return self._rendered
 
     @property
     def text(self) -> str:
@@ -37,4 +44,31 @@ class Button(Component):
 
     @text.setter
     def text(self, text):
-        self._text = text
+        if text != self._text:
+            self._text = text
+            self.mark_dirty()
+
+
+class ParametricButton(ParametricComponent):
+    """
+    One component for a whole list of buttons, on_change receives the payload
+    of the pressed item as callback_data.
+    """
+    __slots__ = ()
+
+    def __init__(
+            self,
+            component_id: str = None,
+            callback_data: str | None = None,
+            on_change: CallBack | None = None):
+        super().__init__(component_id, callback_data, on_change)
+
+    async def handle_payload(self, update: Update, context: ContextTypes.DEFAULT_TYPE, payload: str):
+        await self.call_on_change(update, context, payload)
+
+    def render_item(self, update: Update, context: ContextTypes.DEFAULT_TYPE, payload: str,
+                    text: str) -> InlineKeyboardButton:
+        return InlineKeyboardButton(
+            text,
+            callback_data=self.encode(payload)
+        )
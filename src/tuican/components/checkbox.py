@@ -5,6 +5,11 @@ from .component import CallBack, Component
 
 
 class CheckBox(Component):
+    __slots__ = ("_text", "_selected", "_group")
+    state_fields = Component.state_fields + ("_text", "_selected")
+    routed_by_callback_data = True
+    tracks_changes = True
+
     def __init__(
             self,
             text: str = "",
@@ -22,18 +27,18 @@ class CheckBox(Component):
 
     async def check(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str):
         previous_state = self._selected
-        self._selected = True
+        self._set_selected(True)
         if previous_state != self._selected:
             await self.call_on_change(update, context, callback_data)
 
     async def uncheck(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str):
         previous_state = self._selected
-        self._selected = False
+        self._set_selected(False)
         if previous_state != self._selected:
             await self.call_on_change(update, context, callback_data)
 
     async def toggle(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str):
-        self._selected = not self._selected
+        self._set_selected(not self._selected)
         await self.call_on_change(update, context, callback_data)
 
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
@@ -49,10 +54,17 @@ class CheckBox(Component):
             await super().call_on_change(update, context, callback_data)
 
     def render(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> InlineKeyboardButton:
-        return InlineKeyboardButton(
-            f"{'✓ ' if self.selected else ''}{self.text}",
-            callback_data=self.callback_data
-        )
+        if self._rendered is None:
+            self._rendered = InlineKeyboardButton(
+                f"{'✓ ' if self.selected else ''}{self.text}",
+                callback_data=self.callback_data
+            )
+        return self._rendered
+
+    def _set_selected(self, selected: bool):
+        if selected != self._selected:
+            self._selected = selected
+            self.mark_dirty()
 
     @property
     def text(self) -> str:
@@ -60,7 +72,9 @@ class CheckBox(Component):
 
     @text.setter
     def text(self, text):
-        self._text = text
+        if text != self._text:
+            self._text = text
+            self.mark_dirty()
 
     @property
     def selected(self):
@@ -68,6 +82,8 @@ class CheckBox(Component):
 
 
 class ExclusiveCheckBoxGroup:
+    __slots__ = ("_checkboxes", "_sticky")
+
     def __init__(self, checkboxes: list[CheckBox] | None = None, sticky: bool = False):
         self._checkboxes = [] if checkboxes is None else checkboxes
         self._sticky = sticky
@@ -80,11 +96,11 @@ class ExclusiveCheckBoxGroup:
 
     def notify(self, notifier: CheckBox):
         if self._sticky and not notifier.selected:
-            notifier._selected = True
+            notifier._set_selected(True)
             return
         for checkbox in self._checkboxes:
             if checkbox != notifier:
-                checkbox._selected = False
+                checkbox._set_selected(False)
 
     def get_selected(self) -> CheckBox | None:
         for checkbox in self._checkboxes:
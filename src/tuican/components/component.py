@@ -1,15 +1,80 @@
 import asyncio
+import itertools
+import os
 from abc import ABC, abstractmethod
-from typing import Any, Callable, Coroutine
+from typing import Any, Callable, ClassVar, Coroutine, TYPE_CHECKING
 
 from telegram import InlineKeyboardButton, Update
 from telegram.ext import ContextTypes
 
+from ..deadlines import call_handler
+from ..execution import ExecutionPolicy, INLINE, check_on_change_execution
+from ..metrics import ON_CHANGE_SECONDS, metrics
+
+if TYPE_CHECKING:
+    from .screen import Screen
+
+# telegram limit for InlineKeyboardButton.callback_data in bytes
+CALLBACK_DATA_LIMIT = 64
+PAYLOAD_SEPARATOR = ":"
+
 CallBack = Callable[[Update, ContextTypes.DEFAULT_TYPE, str, "Component"], None] | Callable[
     [Update, ContextTypes.DEFAULT_TYPE, str, "Component"], Coroutine[Any, Any, None]]
 
+_ID_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
+# random start so ids of screens restored from persistence don't clash with new ones
+_ids = itertools.count(int.from_bytes(os.urandom(4)))
+
+
+def next_component_id() -> str:
+    """Short base 36 id, unique within the process."""
+    n = next(_ids)
+    digits = []
+    while True:
+        n, digit = divmod(n, 36)
+        digits.append(_ID_ALPHABET[digit])
+        if not n:
+            return "".join(reversed(digits))
+
+
+async def invoke_on_change(on_change: CallBack, is_coroutine: bool, execution: ExecutionPolicy,
+                           screen: "Screen | None", component: "Component", update: Update,
+                           context: ContextTypes.DEFAULT_TYPE, callback_data: str):
+    """Calls a user on_change, of a component or a SharedComponent, with the deadline and execution policy."""
+    args = (update, context, callback_data, component)
+    with metrics.timer(ON_CHANGE_SECONDS, type(component).__name__):
+        if is_coroutine:
+            await call_handler(on_change, args, screen, context)
+        elif execution is INLINE:
+            on_change(*args)
+        else:
+            await execution.run(on_change, *args)
+    # the callback may change any state get_layout depends on
+    if screen is not None:
+        screen.mark_dirty()
+
 
 class Component(ABC):
+    # subclasses without __slots__ get a __dict__ as usual
+    __slots__ = ("_component_id", "_callback_data", "_on_change", "_on_change_is_coroutine", "_execution", "_hidden",
+                 "_data", "_screen", "_rendered")
+
+    # True if handle_callback only accepts the component's own callback_data,
+    # such components are routed by the screen's index instead of being polled
+    routed_by_callback_data: ClassVar[bool] = False
+    # True if every change of the rendered state calls mark_dirty, otherwise
+    # the screen is considered changed whenever the component handles an update.
+    # A user on_change always marks the screen, it may change anything get_layout reads
+    tracks_changes: ClassVar[bool] = False
+    # attributes saved by get_state and restored by set_state, the state a user can change
+    state_fields: ClassVar[tuple[str, ...]] = ("_hidden", "_data")
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # an overridden handle_callback may accept other callback data, poll it unless the class says otherwise
+        if "handle_callback" in vars(cls) and "routed_by_callback_data" not in vars(cls):
+            cls.routed_by_callback_data = False
+
     def __init__(
             self,
             component_id: str = None,
@@ -17,19 +82,45 @@ class Component(ABC):
             on_change: CallBack | None = None,
             hidden: bool = False,
             data: Any = None):
-        self._component_id = component_id or str(id(self))
+        self._component_id = component_id or next_component_id()
         self._callback_data = callback_data or self.component_id
         self.on_change = on_change
+        self._execution: ExecutionPolicy | None = None
         self._hidden = False
         self._data = data
+        self._screen: "Screen | None" = None
+        # memoized result of render, reset by mark_dirty
+        self._rendered: InlineKeyboardButton | None = None
 
     async def call_on_change(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str):
-        if not self.on_change:
-            return
-        if asyncio.iscoroutinefunction(self.on_change):
-            await self.on_change(update, context, callback_data, self)
-        else:
-            self.on_change(update, context, callback_data, self)
+        if self._on_change:
+            await invoke_on_change(self._on_change, self._on_change_is_coroutine, self.execution_policy(),
+                                   self._screen, self, update, context, callback_data)
+
+    @property
+    def on_change(self) -> CallBack | None:
+        return self._on_change
+
+    @on_change.setter
+    def on_change(self, on_change: CallBack | None):
+        self._on_change = on_change
+        self._on_change_is_coroutine = asyncio.iscoroutinefunction(on_change)
+
+    @property
+    def execution(self) -> ExecutionPolicy | None:
+        """Where a sync on_change runs, None uses the policy of the screen, see tuican.execution."""
+        return self._execution
+
+    @execution.setter
+    def execution(self, execution: ExecutionPolicy | None):
+        self._execution = check_on_change_execution(execution)
+
+    def execution_policy(self) -> ExecutionPolicy:
+        if self._execution is not None:
+            return self._execution
+        if self._screen is not None and self._screen.execution is not None:
+            return self._screen.execution
+        return INLINE
 
     @abstractmethod
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
@@ -41,6 +132,24 @@ class Component(ABC):
     def render(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> InlineKeyboardButton:
         raise NotImplementedError
 
+    def __getstate__(self):
+        # (__dict__ or None, slots) as produced by object.__getstate__ for slotted classes
+        state, slots = super().__getstate__()
+        return state, slots | {"_rendered": None}
+
+    def get_state(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.state_fields)
+
+    def set_state(self, state: tuple):
+        for field, value in zip(self.state_fields, state):
+            setattr(self, field, value)
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        """Invalidate the rendered button and the screen's layout."""
+        self._rendered = None
+        if self._screen is not None:
+            self._screen.mark_dirty()
 
     @property
     def callback_data(self) -> str:
@@ -56,7 +165,9 @@ class Component(ABC):
 
     @hidden.setter
     def hidden(self, hidden: bool):
-        self._hidden = hidden
+        if hidden != self._hidden:
+            self._hidden = hidden
+            self.mark_dirty()
 
     @property
     def data(self):
@@ -68,6 +179,56 @@ class Component(ABC):
 
 
 class MessageHandlingComponent(Component, ABC):
+    __slots__ = ()
+
     @abstractmethod
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
         raise NotImplementedError
+
+
+class ParametricComponent(Component, ABC):
+    """
+    Component that serves an arbitrary number of items with a single object.
+    Items are rendered with callback data prefix:payload where prefix is the component's
+    callback_data, the screen routes such callbacks by prefix and passes the decoded payload.
+    """
+    __slots__ = ()
+
+    def __init__(
+            self,
+            component_id: str = None,
+            callback_data: str = None,
+            on_change: CallBack | None = None,
+            hidden: bool = False,
+            data: Any = None):
+        super().__init__(component_id, callback_data, on_change, hidden, data)
+        if PAYLOAD_SEPARATOR in self.callback_data:
+            raise ValueError(f"callback data prefix can't contain '{PAYLOAD_SEPARATOR}'")
+
+    def encode(self, payload: str) -> str:
+        callback_data = f"{self.callback_data}{PAYLOAD_SEPARATOR}{payload}"
+        if len(callback_data.encode()) > CALLBACK_DATA_LIMIT:
+            raise ValueError(f"callback data {callback_data!r} is longer than {CALLBACK_DATA_LIMIT} bytes")
+        return callback_data
+
+    async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                              callback_data: str | None) -> bool:
+        prefix, separator, payload = (callback_data or "").partition(PAYLOAD_SEPARATOR)
+        if not separator or prefix != self.callback_data:
+            return False
+        await self.handle_payload(update, context, payload)
+        return True
+
+    @abstractmethod
+    async def handle_payload(self, update: Update, context: ContextTypes.DEFAULT_TYPE, payload: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def render_item(self, update: Update, context: ContextTypes.DEFAULT_TYPE, payload: str,
+                    text: str) -> InlineKeyboardButton:
+        raise NotImplementedError
+
+    def render(self, update: Update, context: ContextTypes.DEFAULT_TYPE, payload: str = "",
+               text: str | None = None) -> InlineKeyboardButton:
+        """Button of one item, text defaults to the payload. Without a payload it's a button of the whole component."""
+        return self.render_item(update, context, payload, text if text is not None else payload or self.callback_data)
@@ -5,12 +5,18 @@ from .component import Component
 
 
 class Hline(Component):
+    __slots__ = ()
+    routed_by_callback_data = True
+    tracks_changes = True
+
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
                               callback_data: str | None) -> bool:
         ...
 
     def render(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> InlineKeyboardButton:
-        return InlineKeyboardButton(
-            f"───────────────",
-            callback_data=self.callback_data
-        )
+        if self._rendered is None:
+            self._rendered = InlineKeyboardButton(
+                f"───────────────",
+                callback_data=self.callback_data
+            )
+        return self._rendered
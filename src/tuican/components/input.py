@@ -3,11 +3,16 @@ from collections.abc import Callable
 from telegram import InlineKeyboardButton, Update
 from telegram.ext import ContextTypes
 
+from ..execution import ExecutionPolicy, INLINE
 from .component import CallBack, MessageHandlingComponent
 
 
-# TODO only one input on screen could be active
 class Input[T](MessageHandlingComponent):
+    __slots__ = ("_value", "_text", "_active", "_validation_function", "_validation_execution")
+    # activity is not restored, the input has to be activated again
+    state_fields = MessageHandlingComponent.state_fields + ("_value", "_text")
+    routed_by_callback_data = True
+    tracks_changes = True
 
     def __init__(self,
                  validation_function: Callable[[str], T],
@@ -27,6 +32,7 @@ class Input[T](MessageHandlingComponent):
         self._text = text
         self._active = False
         self._validation_function = validation_function
+        self._validation_execution: ExecutionPolicy | None = None
 
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
         """
@@ -46,11 +52,11 @@ class Input[T](MessageHandlingComponent):
         if not self._active:
             return False
 
-        self._value = self.validate_input(message.text.strip())
+        self.value = await self._validate(message.text.strip())
 
         await self.call_on_change(update, context, str(self._value))
 
-        self._active = False
+        self._set_active(False)
         return True
 
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
@@ -61,31 +67,60 @@ class Input[T](MessageHandlingComponent):
         return True
 
     def render(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> InlineKeyboardButton:
-        return InlineKeyboardButton(
-            f"{'Введите ' if self.active else ''}{self._text}{self._value if self._value is not None else ''}",
-            callback_data=self.callback_data
-        )
+        if self._rendered is None:
+            self._rendered = InlineKeyboardButton(
+                f"{'Введите ' if self.active else ''}{self._text}{self._value if self._value is not None else ''}",
+                callback_data=self.callback_data
+            )
+        return self._rendered
 
     async def activate(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str | None):
         """Activate the input to start accepting messages"""
-        self._active = True
-        self._value = None
+        self._set_active(True)
+        self.value = None
         await self.call_on_change(update, context, callback_data)
 
     async def deactivate(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str | None):
         """Deactivate the input to stop accepting messages"""
-        self._active = False
+        self._set_active(False)
         await self.call_on_change(update, context, callback_data)
 
     async def toggle(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str | None):
-        self._active = not self.active
+        self._set_active(not self.active)
         await self.call_on_change(update, context, callback_data)
 
+    def _set_active(self, active: bool):
+        # only one input on a screen could be active, the screen keeps track of it
+        if active != self._active:
+            self._active = active
+            self.mark_dirty()
+        if self._screen is not None:
+            self._screen._input_activity_changed(self)
+
     def validate_input(self, text: str):
         if not self._validation_function:
             return text
         return self._validation_function(text)
 
+    async def _validate(self, text: str):
+        if not self._validation_function:
+            return text
+        execution = self._validation_execution
+        if execution is None and self._screen is not None:
+            execution = self._screen.validation_execution
+        if execution is None or execution is INLINE:
+            return self.validate_input(text)
+        return await execution.run(self._validation_function, text)
+
+    @property
+    def validation_execution(self) -> ExecutionPolicy | None:
+        """Where the validation function runs, None uses the policy of the screen, see tuican.execution."""
+        return self._validation_execution
+
+    @validation_execution.setter
+    def validation_execution(self, execution: ExecutionPolicy | None):
+        self._validation_execution = execution
+
     @property
     def value(self) -> T | None:
         """Get the current input value"""
@@ -94,7 +129,9 @@ class Input[T](MessageHandlingComponent):
     @value.setter
     def value(self, value: T) -> T | None:
         """Get the current input value"""
-        self._value = value
+        if value != self._value:
+            self._value = value
+            self.mark_dirty()
 
     @property
     def text(self) -> str | None:
@@ -104,7 +141,9 @@ class Input[T](MessageHandlingComponent):
     @text.setter
     def text(self, text) -> str | None:
         """Get the current input value"""
-        self._text = text
+        if text != self._text:
+            self._text = text
+            self.mark_dirty()
 
     @property
     def active(self) -> bool:
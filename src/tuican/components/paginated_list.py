@@ -0,0 +1,232 @@
+import asyncio
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from typing import Protocol
+
+from telegram import InlineKeyboardButton, Update
+from telegram.ext import ContextTypes
+
+from .component import CallBack, ParametricComponent
+
+# telegram limits for inline keyboards
+MAX_BUTTONS_PER_ROW = 8
+MAX_BUTTONS = 100
+
+_ITEM = "i"
+_PAGE = "p"
+
+
+class PageProvider[T](Protocol):
+    async def fetch(self, offset: int, limit: int) -> Sequence[T]:
+        ...
+
+
+class FunctionProvider[T]:
+    """Adapts async fetch(offset, limit) function to PageProvider."""
+
+    def __init__(self, fetch: Callable[[int, int], Awaitable[Sequence[T]]]):
+        self._fetch = fetch
+
+    async def fetch(self, offset: int, limit: int) -> Sequence[T]:
+        return await self._fetch(offset, limit)
+
+
+class IteratorProvider[T]:
+    """
+    Adapts async iterators to PageProvider.
+    The iterator is consumed sequentially, going back restarts it with a new one from the factory.
+    """
+
+    def __init__(self, iterator_factory: Callable[[], AsyncIterator[T]]):
+        self._iterator_factory = iterator_factory
+        self._iterator: AsyncIterator[T] | None = None
+        self._position = 0
+        self._lock = asyncio.Lock()
+
+    async def fetch(self, offset: int, limit: int) -> Sequence[T]:
+        async with self._lock:
+            if self._iterator is None or offset < self._position:
+                self._iterator = aiter(self._iterator_factory())
+                self._position = 0
+            items = []
+            try:
+                while self._position < offset + limit:
+                    item = await anext(self._iterator)
+                    if self._position >= offset:
+                        items.append(item)
+                    self._position += 1
+            except StopAsyncIteration:
+                pass
+            return items
+
+
+class PaginatedList[T](ParametricComponent):
+    """
+    List that renders only the visible page of items fetched from an async provider.
+
+    Fetched pages are kept in a small LRU cache and adjacent pages are prefetched in background.
+    on_change is called with the key of the pressed item as callback_data.
+
+    Args:
+        provider: PageProvider or async function fetch(offset, limit)
+        label: text of the item's button
+        key: payload identifying the item in callback data, must fit into telegram's callback data limit
+        page_size: number of items on a page
+        columns: number of item buttons in a row
+        cached_pages: number of pages kept in memory
+        prefetch: load previous and next page in background after a page is rendered
+    """
+
+    tracks_changes = True
+
+    __slots__ = ("_provider", "_label", "_key", "_page_size", "_columns", "_cached_pages", "_prefetch", "_page",
+                 "_selected_key", "_pages", "_loading")
+    state_fields = ParametricComponent.state_fields + ("_page", "_selected_key")
+
+    def __init__(self,
+                 provider: PageProvider[T] | Callable[[int, int], Awaitable[Sequence[T]]],
+                 label: Callable[[T], str] = str,
+                 key: Callable[[T], str] = str,
+                 page_size: int = 10,
+                 columns: int = 1,
+                 cached_pages: int = 3,
+                 prefetch: bool = True,
+                 component_id: str = None,
+                 callback_data: str | None = None,
+                 on_change: CallBack | None = None):
+        super().__init__(component_id, callback_data, on_change)
+        if not 1 <= columns <= MAX_BUTTONS_PER_ROW:
+            raise ValueError(f"columns should be between 1 and {MAX_BUTTONS_PER_ROW}")
+        # three buttons are reserved for navigation
+        if not 1 <= page_size <= MAX_BUTTONS - 3:
+            raise ValueError(f"page size should be between 1 and {MAX_BUTTONS - 3}")
+        self._provider = provider if hasattr(provider, "fetch") else FunctionProvider(provider)
+        self._label = label
+        self._key = key
+        self._page_size = page_size
+        self._columns = columns
+        self._cached_pages = max(cached_pages, 1)
+        self._prefetch = prefetch
+        self._page = 0
+        self._selected_key: str | None = None
+        # page -> (items, has next page)
+        self._pages: OrderedDict[int, tuple[Sequence[T], bool]] = OrderedDict()
+        self._loading: dict[int, asyncio.Task] = dict()
+
+    def __getstate__(self):
+        # fetched pages are loaded again after restore
+        state, slots = super().__getstate__()
+        return state, slots | {"_pages": OrderedDict(), "_loading": dict()}
+
+    async def handle_payload(self, update: Update, context: ContextTypes.DEFAULT_TYPE, payload: str):
+        kind, _, value = payload.partition(":")
+        if kind == _PAGE:
+            try:
+                page = int(value)
+            except ValueError:
+                # malformed or stale payload is ignored like an unknown callback
+                return
+            self.page = page
+        elif kind == _ITEM:
+            self._selected_key = value
+            await self.call_on_change(update, context, value)
+
+    async def render_rows(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> list[
+        list[InlineKeyboardButton]]:
+        items, has_next = await self._get_page(self._page)
+        if not items and self._page > 0:
+            # data shrank, fall back to the first page
+            self._page = 0
+            items, has_next = await self._get_page(self._page)
+        buttons = [self.render_item(update, context, f"{_ITEM}:{self._key(item)}", self._label(item))
+                   for item in items]
+        rows = [buttons[i:i + self._columns] for i in range(0, len(buttons), self._columns)]
+        navigation = []
+        if self._page > 0:
+            navigation.append(self.render_item(update, context, f"{_PAGE}:{self._page - 1}", "‹"))
+        if self._page > 0 or has_next:
+            navigation.append(self.render_item(update, context, f"{_PAGE}:{self._page}", str(self._page + 1)))
+        if has_next:
+            navigation.append(self.render_item(update, context, f"{_PAGE}:{self._page + 1}", "›"))
+        if navigation:
+            rows.append(navigation)
+        if self._prefetch:
+            if has_next:
+                self._prefetch_page(self._page + 1)
+            if self._page > 0:
+                self._prefetch_page(self._page - 1)
+        return rows
+
+    def render_item(self, update: Update, context: ContextTypes.DEFAULT_TYPE, payload: str,
+                    text: str) -> InlineKeyboardButton:
+        return InlineKeyboardButton(
+            text,
+            callback_data=self.encode(payload)
+        )
+
+    def refresh(self):
+        """Drop cached pages, they will be fetched again on next render."""
+        for task in self._loading.values():
+            task.cancel()
+        self._loading.clear()
+        self._pages.clear()
+        self.mark_dirty()
+
+    async def _get_page(self, page: int) -> tuple[Sequence[T], bool]:
+        if page in self._pages:
+            self._pages.move_to_end(page)
+            return self._pages[page]
+        return await self._loading_task(page)
+
+    def _prefetch_page(self, page: int):
+        if page not in self._pages:
+            task = self._loading_task(page)
+            # failed prefetch is retried when the page is rendered
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def _loading_task(self, page: int) -> asyncio.Task:
+        if page not in self._loading:
+            self._loading[page] = asyncio.create_task(self._load(page))
+        return self._loading[page]
+
+    async def _load(self, page: int) -> tuple[Sequence[T], bool]:
+        try:
+            # one extra item tells whether the next page exists
+            items = await self._provider.fetch(page * self._page_size, self._page_size + 1)
+        finally:
+            # after refresh the page may already be loaded by a new task
+            if self._loading.get(page) is asyncio.current_task():
+                del self._loading[page]
+        entry = (list(items[:self._page_size]), len(items) > self._page_size)
+        self._pages[page] = entry
+        while len(self._pages) > self._cached_pages:
+            oldest = next(iter(self._pages))
+            if oldest == self._page:
+                self._pages.move_to_end(oldest)
+                oldest = next(iter(self._pages))
+            del self._pages[oldest]
+        return entry
+
+    @property
+    def page(self) -> int:
+        return self._page
+
+    @page.setter
+    def page(self, page: int):
+        page = max(page, 0)
+        if page != self._page:
+            self._page = page
+            self.mark_dirty()
+
+    @property
+    def selected_key(self) -> str | None:
+        return self._selected_key
+
+    @property
+    def selected(self) -> T | None:
+        """Selected item if its page is still cached."""
+        for items, _ in self._pages.values():
+            for item in items:
+                if self._key(item) == self._selected_key:
+                    return item
+        return None
@@ -1,19 +1,121 @@
+import logging
 from abc import ABC, abstractmethod
-from typing import ClassVar, Protocol, Sequence
+from typing import ClassVar, Literal, Protocol, Sequence
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 
-from .component import Component, MessageHandlingComponent
+from ..deadlines import DEFAULT_PLACEHOLDER
+from ..execution import ExecutionPolicy, check_on_change_execution
+from ..metrics import DISPATCH_SECONDS, LAYOUT_SECONDS, metrics
+from ..outbound import queued_edits
+from .component import Component, MessageHandlingComponent, PAYLOAD_SEPARATOR, ParametricComponent
+from .input import Input
+from .shared import SharedComponent
+
+logger = logging.getLogger(__name__)
+
+
+class RenderStats:
+    """Process wide counters of message edits, for monitoring."""
+
+    def __init__(self):
+        self.edits_sent = 0
+        # edits skipped because text and markup were the same as the last ones sent
+        self.edits_saved = 0
+
+
+render_stats = RenderStats()
+
+
+# (chat id, message id) of a chat message or id of an inline message
+MessageHandle = tuple[int, int] | str
+
+
+def _message_handle(update: Update) -> MessageHandle | None:
+    query = update.callback_query
+    if query is None:
+        return None
+    if query.message is not None:
+        return query.message.chat.id, query.message.message_id
+    return query.inline_message_id
 
 
 class Screen(ABC):
+    # callback_data -> components shared by all screens of the class, see SharedComponent
+    _shared_components: ClassVar[dict[str, SharedComponent]] = {}
+    # where sync on_change callbacks and validation functions of components without an own policy run
+    execution: ClassVar[ExecutionPolicy | None] = None
+    validation_execution: ClassVar[ExecutionPolicy | None] = None
+    # seconds an async on_change may take before the placeholder is shown, see tuican.deadlines
+    handler_deadline: ClassVar[float | None] = None
+    placeholder: ClassVar[str] = DEFAULT_PLACEHOLDER
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        check_on_change_execution(cls.execution)
+        shared = dict()
+        for klass in reversed(cls.__mro__):
+            for attribute in vars(klass).values():
+                if isinstance(attribute, SharedComponent):
+                    shared[attribute.component.callback_data] = attribute
+        cls._shared_components = shared
 
     def __init__(self, components: list[Component], message: str = None):
         self._message = message
         self._components = components
-        self._update_to_display_on = None
+        # message the screen is displayed on
+        self._message_handle: MessageHandle | None = None
+        # digest of text and markup shown in the message
+        self._message_digest: int | None = None
+        # layout has to be rendered again
+        self._dirty = True
+        # number of displays, the session cache measures the screen again when it changes
+        self._display_count = 0
+        # rows of the last displayed layout, unchanged rows are reused
+        self._last_rows: tuple[tuple[InlineKeyboardButton, ...], ...] = ()
+        # callback_data -> components routed by it
+        self._callback_index: dict[str, list[Component]] = dict()
+        # prefix -> parametric component serving callback data prefix:payload
+        self._prefix_index: dict[str, ParametricComponent] = dict()
+        # components that handle callbacks by their own rules and have to be polled
+        self._polled_components: list[Component] = []
+        # message handling components besides inputs, which are routed by the active input slot
+        self._message_components: list[MessageHandlingComponent] = []
+        self._active_input: Input | None = None
+        for component in components:
+            self._register(component)
+
+    def __getstate__(self):
+        # rendered layout is not kept when the screen is saved, the message is displayed on stays
+        state = self.__dict__.copy()
+        state["_message_digest"] = None
+        state["_last_rows"] = ()
+        state["_dirty"] = True
+        return state
+
+    def get_init_args(self) -> tuple[tuple, dict] | None:
+        """
+        Constructor arguments a lazy_stack ScreenGroup builds the screen again with, see ScreenDescriptor.
+        None, the default, keeps the screen in the stack as it is.
+        """
+        return None
+
+    def get_state(self):
+        """
+        State kept when the screen is replaced by a ScreenDescriptor, the message and state of components.
+        Override together with set_state if the screen has other state a user can change.
+        """
+        return self._message, tuple(component.get_state() for component in self._components)
+
+    def set_state(self, state):
+        message, component_states = state
+        self.message = message
+        # components added after construction can't be matched with the saved ones
+        if len(component_states) == len(self._components):
+            for component, component_state in zip(self._components, component_states):
+                component.set_state(component_state)
 
     @property
     def message(self) -> str:
@@ -21,7 +123,25 @@ class Screen(ABC):
 
     @message.setter
     def message(self, message):
-        self._message = message
+        if message != self._message:
+            self._message = message
+            self.mark_dirty()
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    @property
+    def display_count(self) -> int:
+        return self._display_count
+
+    def mark_dirty(self):
+        """
+        Request the layout to be displayed again.
+        Components and message changes mark the screen automatically, call it when
+        get_layout depends on other state of the screen.
+        """
+        self._dirty = True
 
     @abstractmethod
     async def get_layout(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Sequence[
@@ -29,64 +149,201 @@ class Screen(ABC):
         raise NotImplementedError
 
     async def display(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        layout = await self.get_layout(update, context)
-        await self._send_or_update_message(update, self._message, layout)
+        with metrics.timer(LAYOUT_SECONDS, type(self).__name__):
+            layout = await self.get_layout(update, context)
+        layout = self._reuse_rows(layout)
+        self._dirty = False
+        self._display_count += 1
+        await self._send_or_update_message(update, context, self._message, layout)
+
+    async def display_placeholder(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
+        """Show text instead of the message and keep the keyboard while a handler runs in the background."""
+        await self._send_or_update_message(update, context, text, self._last_rows)
+        self._dirty = True
+
+    @property
+    def active_screen(self) -> "Screen":
+        """Screen the user sees, the top one of nested groups."""
+        return self
+
+    def _reuse_rows(self, layout: Sequence[Sequence[InlineKeyboardButton]]) -> tuple[
+        tuple[InlineKeyboardButton, ...], ...]:
+        previous = self._last_rows
+        rows = []
+        for i, row in enumerate(layout):
+            if i < len(previous) and len(previous[i]) == len(row) and all(
+                    a is b for a, b in zip(previous[i], row)):
+                rows.append(previous[i])
+            else:
+                rows.append(tuple(row))
+        self._last_rows = tuple(rows)
+        return self._last_rows
 
     async def dispatcher(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
-        # TODO: optimisation make a map of components and remove iteration
+        with metrics.timer(DISPATCH_SECONDS, type(self).__name__, "callback"):
+            return await self._route_callback(update, context)
+
+    async def _route_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
         query = update.callback_query
         if query is not None:
-            for component in self._components:
+            for component in self._callback_index.get(query.data, ()):
+                if await component.handle_callback(update, context, query.data):
+                    return self._handled_by(component)
+            shared = self._shared_components.get(query.data)
+            if shared is not None and await shared.handle_callback(self, update, context, query.data):
+                return True
+            prefix, separator, payload = (query.data or "").partition(PAYLOAD_SEPARATOR)
+            if separator and prefix in self._prefix_index:
+                component = self._prefix_index[prefix]
+                await component.handle_payload(update, context, payload)
+                return self._handled_by(component)
+            for component in self._polled_components:
                 if await component.handle_callback(update, context, query.data):
-                    return True
+                    return self._handled_by(component)
         return False
 
     async def message_dispatcher(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
-        # TODO: optimisation make a map of components and remove iteration
+        with metrics.timer(DISPATCH_SECONDS, type(self).__name__, "message"):
+            return await self._route_message(update, context)
+
+    async def _route_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
         message = update.message
         if message is not None:
-            for component in self._components:
-                if isinstance(component, MessageHandlingComponent):
-                    if await component.handle_message(update, context):
-                        return True
+            if self._active_input is not None and await self._active_input.handle_message(update, context):
+                return True
+            for component in self._message_components:
+                if await component.handle_message(update, context):
+                    return self._handled_by(component)
         return False
 
+    def _handled_by(self, component: Component) -> bool:
+        if not component.tracks_changes:
+            self.mark_dirty()
+        return True
+
+    @property
+    def active_input(self) -> Input | None:
+        return self._active_input
+
     def add_component(self, comp: Component):
         self._components.append(comp)
+        self._register(comp)
+        self.mark_dirty()
 
     def add_components(self, comps: list[Component]):
         self._components.extend(comps)
+        for comp in comps:
+            self._register(comp)
+        self.mark_dirty()
 
     def delete_component(self, comp: Component):
         self._components.remove(comp)
-
-    async def _send_or_update_message(self, update: Update, text: str,
+        self._unregister(comp)
+        self.mark_dirty()
+
+    def _register(self, comp: Component):
+        comp._screen = self
+        if isinstance(comp, ParametricComponent):
+            self._prefix_index[comp.callback_data] = comp
+        elif comp.routed_by_callback_data:
+            self._callback_index.setdefault(comp.callback_data, []).append(comp)
+        else:
+            self._polled_components.append(comp)
+        if isinstance(comp, Input):
+            if comp.active:
+                self._input_activity_changed(comp)
+        elif isinstance(comp, MessageHandlingComponent):
+            self._message_components.append(comp)
+
+    def _unregister(self, comp: Component):
+        comp._screen = None
+        if isinstance(comp, ParametricComponent):
+            del self._prefix_index[comp.callback_data]
+        elif comp.routed_by_callback_data:
+            routed = self._callback_index[comp.callback_data]
+            routed.remove(comp)
+            if not routed:
+                del self._callback_index[comp.callback_data]
+        else:
+            self._polled_components.remove(comp)
+        if comp is self._active_input:
+            self._active_input = None
+        elif isinstance(comp, MessageHandlingComponent) and not isinstance(comp, Input):
+            self._message_components.remove(comp)
+
+    def _input_activity_changed(self, comp: Input):
+        if comp.active:
+            if self._active_input is not None and self._active_input is not comp:
+                self._active_input._active = False
+                self._active_input.mark_dirty()
+            self._active_input = comp
+        elif self._active_input is comp:
+            self._active_input = None
+
+    async def _send_or_update_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str,
                                       keyboard_markup: Sequence[Sequence[InlineKeyboardButton]]):
         # send new message with markup or update existing one
-        if update.callback_query is not None:
-            self._update_to_display_on = update
-        update = self._update_to_display_on if self._update_to_display_on is not None else update
+        handle = _message_handle(update)
+        if handle is not None and handle != self._message_handle:
+            # a button of another message was pressed, the screen moves to it
+            self._message_handle = handle
+            self._message_digest = None
+        reply_markup = InlineKeyboardMarkup(keyboard_markup)
+        digest = hash((text, reply_markup))
         try:
-            if update.message:
-                await update.message.reply_text(
-                    text=text,
-                    reply_markup=InlineKeyboardMarkup(keyboard_markup),
-                    parse_mode="HTML"
-                )
-            elif update.callback_query:
-                await update.callback_query.edit_message_text(
+            if self._message_handle is None:
+                message = await context.bot.send_message(
+                    chat_id=update.effective_chat.id,
                     text=text,
-                    reply_markup=InlineKeyboardMarkup(keyboard_markup),
+                    reply_markup=reply_markup,
                     parse_mode="HTML"
                 )
+                self._message_handle = (message.chat_id, message.message_id)
+            else:
+                if self._message_digest == digest:
+                    render_stats.edits_saved += 1
+                    return
+                # an edit waiting for the rate limit doesn't hold the chat, later displays replace it
+                with queued_edits(on_failure=lambda: self._edit_failed(digest)):
+                    await context.bot.edit_message_text(
+                        text=text,
+                        reply_markup=reply_markup,
+                        parse_mode="HTML",
+                        **self._edit_target()
+                    )
+                render_stats.edits_sent += 1
+            self._message_digest = digest
         except BadRequest as e:
-            print(f"No modifications needed: {e.message}")
+            if "not modified" in e.message:
+                self._message_digest = digest
+                logger.debug("message not modified: %s", e.message, extra={"screen": type(self).__name__})
+            else:
+                logger.warning("message not sent: %s", e.message, extra={
+                    "user_id": update.effective_user.id if update.effective_user else None,
+                    "screen": type(self).__name__, "error": type(e).__name__})
+
+    def _edit_failed(self, digest: int):
+        # the message doesn't show the content, the next display edits it again
+        if self._message_digest == digest:
+            self._message_digest = None
+
+    def _edit_target(self) -> dict:
+        if isinstance(self._message_handle, str):
+            return {"inline_message_id": self._message_handle}
+        chat_id, message_id = self._message_handle
+        return {"chat_id": chat_id, "message_id": message_id}
 
     async def start_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         await self.display(update, context)
 
     def clear_update(self):
-        self._update_to_display_on = None
+        """Forget the message the screen is displayed on, next display sends a new message."""
+        self._message_handle = None
+        self._message_digest = None
+
+    @property
+    def message_handle(self) -> MessageHandle | None:
+        return self._message_handle
 
     async def command_handler(self, args: list[str], update: Update, context: ContextTypes.DEFAULT_TYPE):
         # args is a list of [command, arg1 ...]
@@ -97,23 +354,93 @@ class Screen(ABC):
         await context.bot.send_message(chat_id=chat_id, text=text)
 
 
-class ScreenGroup(Screen):
+class ScreenDescriptor:
+    """Screen of a ScreenGroup stack that is not displayed, kept as its class, constructor arguments and state."""
+    __slots__ = ("screen_class", "args", "kwargs", "state")
+
+    def __init__(self, screen: Screen):
+        self.screen_class = type(screen)
+        self.args, self.kwargs = screen.get_init_args()
+        self.state = screen.get_state()
+
+    def materialize(self) -> Screen:
+        screen = self.screen_class(*self.args, **self.kwargs)
+        screen.set_state(self.state)
+        return screen
 
-    def __init__(self, home_screen: Screen):
+
+class ScreenGroup(Screen):
+    """
+    Screens navigated as a stack, the top one is displayed.
+
+    Args:
+        home_screen: bottom of the stack, it is never removed
+        lazy_stack: replace screens covered by a new one with ScreenDescriptor if they return their constructor
+            arguments from get_init_args, they are constructed again when go_back returns to them. Meant for
+            screens created on navigation, their constructor has to be safe to call again and
+            get_state/set_state have to cover state a user can change
+        max_depth: maximal number of screens in the stack including home
+        overflow: 'drop_oldest' removes the screen above home when the stack is full, 'raise' raises RuntimeError
+    """
+
+    def __init__(self,
+                 home_screen: Screen,
+                 lazy_stack: bool = False,
+                 max_depth: int | None = None,
+                 overflow: Literal["drop_oldest", "raise"] = "drop_oldest"):
         super().__init__([])
+        if max_depth is not None and max_depth < 2:
+            raise ValueError("max depth should be at least 2")
+        if overflow not in ("drop_oldest", "raise"):
+            raise ValueError(f"unknown overflow policy {overflow!r}")
         self._home = home_screen
-        self._screen_stack: list[Screen] = [home_screen]
+        # every screen but the top one may be a descriptor if lazy_stack
+        self._screen_stack: list[Screen | ScreenDescriptor] = [home_screen]
+        self._lazy_stack = lazy_stack
+        self._max_depth = max_depth
+        self._overflow = overflow
 
     async def go_to_screen(self, update: Update, context: ContextTypes.DEFAULT_TYPE, new_screen: Screen):
+        full = self._max_depth is not None and len(self._screen_stack) >= self._max_depth
+        if full and self._overflow == "raise":
+            raise RuntimeError(f"can't go deeper than {self._max_depth} screens")
+        previous = self._screen_stack[-1]
+        if self._lazy_stack and previous is not self._home and not isinstance(previous, ScreenGroup) \
+                and previous.get_init_args() is not None:
+            self._screen_stack[-1] = ScreenDescriptor(previous)
+        if full:
+            del self._screen_stack[1]
         self._screen_stack.append(new_screen)
+        self._top_changed(previous)
 
     async def go_back(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if len(self._screen_stack) <= 1:
             raise RuntimeError("can't go back")
-        self._screen_stack.pop()
+        previous = self._screen_stack.pop()
+        if isinstance(self._screen_stack[-1], ScreenDescriptor):
+            self._screen_stack[-1] = self._screen_stack[-1].materialize()
+        self._top_changed(previous)
 
     async def go_home(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        previous = self._screen_stack[-1]
         self._screen_stack = self._screen_stack[:1]
+        self._top_changed(previous)
+
+    def _top_changed(self, previous: Screen):
+        # screens of the group share one message, the new top screen takes it over
+        top = self._screen_stack[-1]
+        if top is not previous:
+            top._message_handle = previous._message_handle
+            top._message_digest = None
+        self.mark_dirty()
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty or self._screen_stack[-1].dirty
+
+    @property
+    def active_screen(self) -> Screen:
+        return self._screen_stack[-1].active_screen
 
     async def get_layout(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Sequence[
         Sequence[InlineKeyboardButton]]:
@@ -126,10 +453,16 @@ class ScreenGroup(Screen):
         return await self._screen_stack[-1].message_dispatcher(update, context)
 
     async def display(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        self._dirty = False
+        self._display_count += 1
         return await self._screen_stack[-1].display(update, context)
 
     def clear_update(self):
-        self._screen_stack[-1]._update_to_display_on = None
+        self._screen_stack[-1].clear_update()
+
+    @property
+    def message_handle(self) -> MessageHandle | None:
+        return self._screen_stack[-1].message_handle
 
     @property
     def message(self) -> str:
@@ -149,3 +482,4 @@ class StartScreenProtocol(Protocol):
 
     def __call__(self) -> Screen:
         ...
+
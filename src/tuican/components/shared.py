@@ -0,0 +1,82 @@
+import asyncio
+from typing import TYPE_CHECKING
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from ..execution import INLINE
+from .component import Component, MessageHandlingComponent, ParametricComponent, invoke_on_change
+
+if TYPE_CHECKING:
+    from .screen import Screen
+
+# component class -> its immutable subclass
+_frozen_classes: dict[type, type] = dict()
+
+
+class Frozen:
+    """Base of the immutable classes of shared components, they belong to no session."""
+    __slots__ = ()
+
+
+def _immutable(self, name, value=None):
+    raise AttributeError(f"shared {type(self).__mro__[1].__name__} can't be changed")
+
+
+def _freeze(component: Component):
+    cls = type(component)
+    frozen = _frozen_classes.get(cls)
+    if frozen is None:
+        frozen = type(f"Shared{cls.__name__}", (cls, Frozen), {
+            "__slots__": (),
+            "__setattr__": _immutable,
+            "__delattr__": _immutable,
+        })
+        _frozen_classes[cls] = frozen
+    component.__class__ = frozen
+
+
+class SharedComponent:
+    """
+    Component declared once on the screen class and shared by all its sessions.
+
+    The component is rendered once and becomes immutable, every display reuses the same
+    InlineKeyboardButton. Accessing the attribute returns the component, so it is rendered
+    in get_layout like an own component. on_change is the name of the screen's method
+    called with the usual arguments when the component is pressed.
+
+    Components that change on a click, like CheckBox or Input, can't be shared. Give shared
+    components an explicit callback_data, generated ids differ between processes.
+    """
+
+    def __init__(self, component: Component, on_change: str | None = None):
+        if isinstance(component, (MessageHandlingComponent, ParametricComponent)):
+            raise TypeError(f"{type(component).__name__} can't be shared")
+        if not component.routed_by_callback_data:
+            raise TypeError("only components routed by callback data can be shared")
+        component.on_change = None
+        component.render(None, None)
+        _freeze(component)
+        self.component = component
+        self.on_change = on_change
+        # screen class -> on_change is a coroutine function
+        self._is_coroutine: dict[type, bool] = dict()
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None) -> Component:
+        return self.component
+
+    async def handle_callback(self, screen: "Screen", update: Update, context: ContextTypes.DEFAULT_TYPE,
+                              callback_data: str) -> bool:
+        if not await self.component.handle_callback(update, context, callback_data):
+            return False
+        if self.on_change is not None:
+            on_change = getattr(screen, self.on_change)
+            is_coroutine = self._is_coroutine.get(type(screen))
+            if is_coroutine is None:
+                is_coroutine = self._is_coroutine[type(screen)] = asyncio.iscoroutinefunction(on_change)
+            await invoke_on_change(on_change, is_coroutine, screen.execution or INLINE, screen, self.component,
+                                   update, context, callback_data)
+        return True
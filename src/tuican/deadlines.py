@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, Callable, Coroutine, TYPE_CHECKING
+
+from telegram.ext import ContextTypes
+
+if TYPE_CHECKING:
+    from .components import Screen
+
+DEFAULT_PLACEHOLDER = "⏳ working…"
+
+# attribute of the update's context with handlers that missed their deadline,
+# a context belongs to one update of one application
+_DEFERRED = "_tuican_deferred"
+
+
+def deadline(seconds: float, placeholder: str = DEFAULT_PLACEHOLDER):
+    """
+    Decorator of an async on_change handler. If the handler runs longer than seconds, the message shows
+    the placeholder, the handler continues in the background and the screen is displayed when it's done.
+    Screen.handler_deadline sets a deadline for all handlers of a screen.
+    """
+
+    def decorate(handler):
+        handler._tuican_deadline = (seconds, placeholder)
+        return handler
+
+    return decorate
+
+
+class Deferred:
+    """Handler that missed its deadline and runs in the background."""
+
+    def __init__(self, task: asyncio.Task, placeholder: str):
+        self.task = task
+        self.placeholder = placeholder
+        # innermost screen displayed when the handler was deferred, see Screen.active_screen
+        self.owner: "Screen | None" = None
+
+
+async def call_handler(handler: Callable[..., Coroutine[Any, Any, Any]], args: tuple, screen: "Screen | None",
+                       context: ContextTypes.DEFAULT_TYPE | None):
+    config = getattr(handler, "_tuican_deadline", None)
+    if config is None and screen is not None and screen.handler_deadline is not None:
+        config = (screen.handler_deadline, screen.placeholder)
+    if config is None or context is None:
+        return await handler(*args)
+    task = asyncio.create_task(handler(*args))
+    try:
+        done, _ = await asyncio.wait((task,), timeout=config[0])
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if done:
+        return task.result()
+    deferred = getattr(context, _DEFERRED, None)
+    if deferred is None:
+        deferred = []
+        setattr(context, _DEFERRED, deferred)
+    deferred.append(Deferred(task, config[1]))
+
+
+def pop_deferred(context: ContextTypes.DEFAULT_TYPE) -> list[Deferred]:
+    """Handlers of the update that missed their deadline, called by the application after dispatch."""
+    deferred = getattr(context, _DEFERRED, None)
+    if deferred is None:
+        return []
+    delattr(context, _DEFERRED)
+    return deferred
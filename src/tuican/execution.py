@@ -0,0 +1,113 @@
+"""
+Where synchronous callbacks of components run.
+
+Sync on_change callbacks and validation functions run on the event loop by default, a heavy one
+stalls every user. A component or a screen class can move them to a thread or process pool:
+
+    class ReportScreen(Screen):
+        execution = ThreadPoolExecution(max_workers=4, timeout=30)
+
+Coroutine callbacks always run on the event loop.
+"""
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class ExecutionPolicy(ABC):
+    @abstractmethod
+    async def run(self, function: Callable[..., Any], *args) -> Any:
+        ...
+
+
+class InlineExecution(ExecutionPolicy):
+    """Calls the function on the event loop."""
+
+    async def run(self, function: Callable[..., Any], *args) -> Any:
+        return function(*args)
+
+
+INLINE = InlineExecution()
+
+
+class PoolExecution(ExecutionPolicy):
+    """
+    Runs the function in an executor created on first use.
+
+    At most max_workers functions of the policy run or wait in the executor, further calls wait for a slot,
+    so a burst of clicks can't queue unbounded work. A call waiting for a slot or running longer than
+    timeout seconds raises TimeoutError, a function that already started can't be stopped
+    and keeps its slot until it returns.
+    When a session is restored from persistence its components get copies of their policies,
+    give a policy to the screen class to share it.
+    """
+
+    def __init__(self, max_workers: int = 4, timeout: float | None = None):
+        self._max_workers = max_workers
+        self._timeout = timeout
+        self._executor: Executor | None = None
+        # created in the loop that runs the functions, policies are often created at import time
+        self._slots: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @abstractmethod
+    def _create_executor(self) -> Executor:
+        ...
+
+    async def run(self, function: Callable[..., Any], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self._max_workers)
+        slots = self._slots
+        try:
+            async with asyncio.timeout(self._timeout) as timeout:
+                await slots.acquire()
+                if self._executor is None:
+                    self._executor = self._create_executor()
+                future = loop.run_in_executor(self._executor, function, *args)
+                future.add_done_callback(lambda _: slots.release())
+                return await asyncio.shield(future)
+        except TimeoutError:
+            if timeout.expired():
+                raise TimeoutError(f"{getattr(function, '__qualname__', function)} "
+                                   f"didn't finish in {self._timeout}s") from None
+            raise
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait, cancel_futures=True)
+            self._executor = None
+
+    def __getstate__(self):
+        return self._max_workers, self._timeout
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+
+class ThreadPoolExecution(PoolExecution):
+    """For blocking I/O and work that releases the GIL, the function may change the component as usual."""
+
+    def _create_executor(self) -> Executor:
+        return ThreadPoolExecutor(self._max_workers, thread_name_prefix="tuican-execution")
+
+
+class ProcessPoolExecution(PoolExecution):
+    """
+    For CPU bound validation functions. The function and its arguments are pickled, so it has
+    to be defined at module level, and changes it makes aren't seen by the bot. on_change callbacks
+    receive the update and the context, which can't be pickled, run them with ThreadPoolExecution.
+    """
+
+    def _create_executor(self) -> Executor:
+        return ProcessPoolExecutor(self._max_workers)
+
+
+def check_on_change_execution(execution: ExecutionPolicy | None) -> ExecutionPolicy | None:
+    """on_change receives the update and the context, which can't be pickled for a process pool."""
+    if isinstance(execution, ProcessPoolExecution):
+        raise TypeError("on_change can't run in a process pool, use ThreadPoolExecution, "
+                        "ProcessPoolExecution is for validation_execution")
+    return execution
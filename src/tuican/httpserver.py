@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HttpRequest:
+    method: str
+    path: str
+    # header names are lower case
+    headers: dict[str, str]
+    body: bytes
+
+
+@dataclass
+class HttpResponse:
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+HttpHandler = Callable[[HttpRequest], Awaitable[HttpResponse]]
+
+
+class _BadRequest(Exception):
+    def __init__(self, status: HTTPStatus = HTTPStatus.BAD_REQUEST):
+        super().__init__(status.phrase)
+        self.status = status
+
+
+async def start_http_server(handler: HttpHandler, host: str, port: int,
+                            max_body_size: int = 1024 * 1024,
+                            max_header_size: int = 16 * 1024,
+                            max_headers: int = 100) -> asyncio.Server:
+    """
+    Minimal HTTP/1.1 server with keep-alive connections, enough for webhooks and metrics.
+    max_header_size limits the request line and all headers together.
+    """
+
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader, max_body_size, max_header_size, max_headers)
+                except _BadRequest as e:
+                    await _write_response(writer, HttpResponse(e.status), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                try:
+                    response = await handler(request)
+                except Exception as e:
+                    logger.exception("request to %s failed", request.path, extra={"error": type(e).__name__})
+                    await _write_response(writer, HttpResponse(HTTPStatus.INTERNAL_SERVER_ERROR), keep_alive=False)
+                    break
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await _write_response(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # a longer line makes readline raise ValueError
+    return await asyncio.start_server(serve, host, port, limit=max_header_size)
+
+
+async def _readline(reader: asyncio.StreamReader) -> bytes:
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise _BadRequest(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+
+
+async def _read_request(reader: asyncio.StreamReader, max_body_size: int, max_header_size: int,
+                        max_headers: int) -> HttpRequest | None:
+    request_line = await _readline(reader)
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise _BadRequest()
+    headers = dict()
+    size = len(request_line)
+    count = 0
+    while True:
+        line = await _readline(reader)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        size += len(line)
+        count += 1
+        if size > max_header_size or count > max_headers:
+            raise _BadRequest(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise _BadRequest()
+    if length < 0:
+        raise _BadRequest()
+    if length > max_body_size:
+        raise _BadRequest(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    body = await reader.readexactly(length) if length else b""
+    return HttpRequest(method.upper(), path, headers, body)
+
+
+async def _write_response(writer: asyncio.StreamWriter, response: HttpResponse, keep_alive: bool):
+    status = HTTPStatus(response.status)
+    head = [
+        f"HTTP/1.1 {status.value} {status.phrase}",
+        f"Content-Type: {response.content_type}",
+        f"Content-Length: {len(response.body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    head.extend(f"{name}: {value}" for name, value in response.headers.items())
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body)
+    await writer.drain()
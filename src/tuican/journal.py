@@ -0,0 +1,120 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Iterator
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+
+def journal_files(path: str) -> list[str]:
+    """Existing files of a journal from the oldest rotated one to the current one."""
+    files = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        files.append(f"{path}.{index}")
+        index += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_journal(path: str) -> Iterator[tuple[float, dict]]:
+    """(arrival time, update JSON dict) of every update in the journal, rotated files included."""
+    for file_path in journal_files(path):
+        with open(file_path, encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["time"], record["update"]
+
+
+class UpdateJournal:
+    """
+    Write-behind journal of incoming updates, one JSON line {"time": arrival, "update": update} per update.
+
+    Lines are buffered and appended to the file every flush_interval seconds in a thread.
+    When the file grows over max_bytes it is rotated like logging.handlers.RotatingFileHandler,
+    path.1 being the newest of backup_count old files.
+    The journal contains messages of users, keep it as private as the bot's data.
+    """
+
+    def __init__(self,
+                 path: str,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 backup_count: int = 5,
+                 flush_interval: float = 1.0,
+                 clock: Callable[[], float] = time.time):
+        self._path = path
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._flush_interval = flush_interval
+        self._clock = clock
+        self._buffer: list[str] = []
+        # a write of a cancelled flush may still run in its thread
+        self._write_lock = threading.Lock()
+        self._flusher: asyncio.Task | None = None
+        self._recorded = 0
+
+    def record(self, update: Update):
+        self._buffer.append(json.dumps({"time": self._clock(), "update": update.to_dict()}, ensure_ascii=False))
+        self._recorded += 1
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, lines)
+        except OSError:
+            self._buffer[:0] = lines
+            raise
+
+    def _write(self, lines: list[str]):
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        with self._write_lock:
+            if os.path.exists(self._path) and os.path.getsize(self._path) + len(data) > self._max_bytes:
+                self._rotate()
+            with open(self._path, "ab") as file:
+                file.write(data)
+
+    def _rotate(self):
+        if self._backup_count <= 0:
+            os.remove(self._path)
+            return
+        for index in range(self._backup_count - 1, 0, -1):
+            source = f"{self._path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self._path}.{index + 1}")
+        os.replace(self._path, f"{self._path}.1")
+
+    async def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except OSError as e:
+                logger.warning("journal was not written: %s", e, extra={"error": type(e).__name__})
+
+    @property
+    def recorded(self) -> int:
+        return self._recorded
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
@@ -0,0 +1,177 @@
+"""
+Logging of the framework without blocking the event loop.
+
+Modules log to children of the "tuican" logger. QueueLogging, installed by Application by default,
+puts records in a queue and a thread writes them to the handlers, so a slow stderr or file
+doesn't stall dispatch. Repeated records of one error class are sampled and the dropped ones are
+summarized as "N suppressed". Structured fields are passed with extra and rendered as key=value.
+"""
+import asyncio
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable
+
+logger = logging.getLogger("tuican")
+
+# fields given with extra=..., rendered in this order after the message
+FIELDS = ("user_id", "screen", "callback_data", "latency", "error", "suppressed")
+
+
+class StructuredFormatter(logging.Formatter):
+    def __init__(self, fmt: str = "%(asctime)s %(levelname)s %(name)s: %(message)s"):
+        super().__init__(fmt)
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        message = super().formatMessage(record)
+        fields = []
+        for name in FIELDS:
+            value = getattr(record, name, None)
+            if value is None:
+                continue
+            if isinstance(value, float):
+                value = f"{value:.3f}"
+            elif isinstance(value, str) and (not value or " " in value or '"' in value):
+                value = '"' + value.replace('"', '\\"') + '"'
+            fields.append(f"{name}={value}")
+        return f"{message} {' '.join(fields)}" if fields else message
+
+
+def _sample_key(record: logging.LogRecord) -> tuple:
+    error = getattr(record, "error", None)
+    if error is None and record.exc_info:
+        error = record.exc_info[0].__name__
+    return record.name, record.levelno, error if error is not None else record.msg
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Passes at most burst records of a key per interval, the key is the logger, level and error class,
+    or the message template for records without an error.
+    The next passed record of a key tells how many were suppressed before it, summaries() reports
+    keys with suppressed records that had none passed since.
+    """
+
+    def __init__(self, burst: int = 5, interval: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self._burst = burst
+        self._interval = interval
+        self._clock = clock
+        # key -> [window start, passed in the window, suppressed, last suppressed record]
+        self._windows: dict[tuple, list] = dict()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or getattr(record, "suppressed", None) is not None:
+            return True
+        now = self._clock()
+        key = _sample_key(record)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = [now, 0, 0, None]
+        elif now - window[0] >= self._interval:
+            window[0] = now
+            window[1] = 0
+        if window[1] >= self._burst:
+            window[2] += 1
+            window[3] = record
+            return False
+        window[1] += 1
+        if window[2]:
+            record.suppressed = window[2]
+            window[2] = 0
+            window[3] = None
+        return True
+
+    def summaries(self, force: bool = False) -> list[logging.LogRecord]:
+        """Summary records of keys whose window is over, or of all keys if force."""
+        now = self._clock()
+        records = []
+        for key, window in list(self._windows.items()):
+            if not force and now - window[0] < self._interval:
+                continue
+            if window[2]:
+                last = window[3]
+                summary = logging.makeLogRecord({
+                    "name": last.name, "levelno": last.levelno, "levelname": last.levelname,
+                    "msg": "%d similar records suppressed, last: %s", "args": (window[2], last.getMessage()),
+                    "error": getattr(last, "error", None), "suppressed": window[2],
+                })
+                records.append(summary)
+            del self._windows[key]
+        return records
+
+
+class _LocalQueueHandler(QueueHandler):
+    # the queue doesn't leave the process, records are formatted by the listener thread
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class QueueLogging:
+    """
+    Sends records of the "tuican" logger through a queue to handlers run in a thread.
+
+    The default handler writes to stderr with StructuredFormatter. Records of WARNING and above are
+    sampled by SamplingFilter, summaries of suppressed records are logged every interval.
+    While installed the "tuican" logger doesn't propagate to the root logger, use
+    Application.logging(None) to configure logging yourself.
+    """
+
+    def __init__(self,
+                 handlers: list[logging.Handler] | None = None,
+                 level: int = logging.INFO,
+                 burst: int = 5,
+                 interval: float = 60.0):
+        if handlers is None:
+            handler = logging.StreamHandler()
+            handler.setFormatter(StructuredFormatter())
+            handlers = [handler]
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._handler = _LocalQueueHandler(self._queue)
+        self._sampler = SamplingFilter(burst, interval)
+        self._handler.addFilter(self._sampler)
+        self._listener = QueueListener(self._queue, *handlers, respect_handler_level=True)
+        self._level = level
+        self._interval = interval
+        self._saved: tuple[int, bool] | None = None
+        self._summarizer: asyncio.Task | None = None
+
+    def install(self):
+        if self._saved is not None:
+            return
+        self._saved = (logger.level, logger.propagate)
+        logger.setLevel(self._level)
+        logger.propagate = False
+        logger.addHandler(self._handler)
+        self._listener.start()
+
+    def uninstall(self):
+        if self._saved is None:
+            return
+        self._emit_summaries(force=True)
+        logger.removeHandler(self._handler)
+        logger.level, logger.propagate = self._saved
+        self._saved = None
+        # waits for the queued records to be written
+        self._listener.stop()
+
+    async def start(self):
+        self.install()
+        if self._summarizer is None:
+            self._summarizer = asyncio.create_task(self._summarize_periodically())
+
+    async def stop(self):
+        if self._summarizer is not None:
+            self._summarizer.cancel()
+            self._summarizer = None
+        await asyncio.to_thread(self.uninstall)
+
+    def _emit_summaries(self, force: bool = False):
+        for record in self._sampler.summaries(force):
+            self._queue.put_nowait(record)
+
+    async def _summarize_periodically(self):
+        while True:
+            await asyncio.sleep(self._interval)
+            self._emit_summaries()
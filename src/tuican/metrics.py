@@ -0,0 +1,254 @@
+"""
+Process wide latency histograms and counters of the framework's hot paths.
+
+Instrumentation is disabled until Application.metrics() enables it, disabled timers are a shared no-op.
+"""
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Any, Callable, Coroutine, Iterable
+
+from telegram.error import TelegramError
+from telegram.ext import BaseRateLimiter
+
+from .httpserver import HttpRequest, HttpResponse
+
+# upper bounds in seconds, +Inf is implied
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SCREEN_LOOKUP_SECONDS = "tuican_screen_lookup_seconds"
+DISPATCH_SECONDS = "tuican_dispatch_seconds"
+ON_CHANGE_SECONDS = "tuican_on_change_seconds"
+LAYOUT_SECONDS = "tuican_layout_seconds"
+BOT_API_SECONDS = "tuican_bot_api_seconds"
+BOT_API_ERRORS = "tuican_bot_api_errors_total"
+HANDLER_ERRORS = "tuican_handler_errors_total"
+
+# name -> (type, label names, help)
+FAMILIES: dict[str, tuple[str, tuple[str, ...], str]] = {
+    SCREEN_LOOKUP_SECONDS: ("histogram", ("screen",), "Application.get_or_create_screen, by screen class"),
+    DISPATCH_SECONDS: ("histogram", ("screen", "kind"), "Screen.dispatcher and message_dispatcher"),
+    ON_CHANGE_SECONDS: ("histogram", ("component",), "Component.call_on_change, by component class"),
+    LAYOUT_SECONDS: ("histogram", ("screen",), "Screen.get_layout"),
+    BOT_API_SECONDS: ("histogram", ("method",), "Bot API calls, rate limiter waits excluded"),
+    BOT_API_ERRORS: ("counter", ("method", "error"), "failed Bot API calls"),
+    HANDLER_ERRORS: ("counter", ("error",), "exceptions passed to Application.handle_exception"),
+}
+
+# (name, type, labels, value) of a metric read from another component by a collector
+Sample = tuple[str, str, dict[str, str], float]
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+@dataclass(frozen=True)
+class HistogramSnapshot:
+    count: int
+    sum: float
+    # (upper bound, cumulative count), the last bound is inf
+    buckets: tuple[tuple[float, int], ...]
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket containing the quantile."""
+        rank = q * self.count
+        for bound, cumulative in self.buckets:
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+
+class _Timer:
+    __slots__ = ("_metrics", "_name", "_labels", "_start")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: tuple[str, ...]):
+        self._metrics = metrics
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._metrics.observe(self._name, self._labels, time.perf_counter() - self._start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.enabled = False
+        self._buckets = buckets
+        # name -> label values -> histogram or counter value
+        self._histograms: dict[str, dict[tuple[str, ...], Histogram]] = {}
+        self._counters: dict[str, dict[tuple[str, ...], float]] = {}
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+
+    def timer(self, name: str, *labels: str) -> _Timer | _NullTimer:
+        """Context manager observing the duration of its block, with label values in the family's order."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def observe(self, name: str, labels: tuple[str, ...], value: float):
+        family = self._histograms.setdefault(name, {})
+        histogram = family.get(labels)
+        if histogram is None:
+            histogram = family[labels] = Histogram(self._buckets)
+        histogram.observe(value)
+
+    def inc(self, name: str, *labels: str, amount: float = 1):
+        if self.enabled:
+            family = self._counters.setdefault(name, {})
+            family[labels] = family.get(labels, 0) + amount
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """Collector is called on every snapshot, e.g. to expose stats of the session cache."""
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], Iterable[Sample]]):
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def reset(self):
+        self._histograms.clear()
+        self._counters.clear()
+
+    def snapshot(self) -> dict[str, dict[tuple[str, ...], HistogramSnapshot | float]]:
+        """name -> label values -> histogram or value, collector samples are keyed by their label values."""
+        result: dict[str, dict[tuple[str, ...], HistogramSnapshot | float]] = {}
+        for name, family in self._histograms.items():
+            result[name] = {labels: _snapshot(histogram) for labels, histogram in family.items()}
+        for name, family in self._counters.items():
+            result[name] = dict(family)
+        for name, _, labels, value in self._collected():
+            result.setdefault(name, {})[tuple(labels.values())] = value
+        return result
+
+    def _collected(self) -> list[Sample]:
+        return [sample for collector in self._collectors for sample in collector()]
+
+    def exposition(self) -> str:
+        """Prometheus text format."""
+        lines = []
+        for name, family in self._histograms.items():
+            label_names = FAMILIES.get(name, ("histogram", (), ""))[1]
+            _header(lines, name, "histogram")
+            for labels, histogram in family.items():
+                snapshot = _snapshot(histogram)
+                base = dict(zip(label_names, labels))
+                for bound, cumulative in snapshot.buckets:
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_labels(base | {'le': le})} {cumulative}")
+                lines.append(f"{name}_sum{_labels(base)} {snapshot.sum}")
+                lines.append(f"{name}_count{_labels(base)} {snapshot.count}")
+        for name, family in self._counters.items():
+            label_names = FAMILIES.get(name, ("counter", (), ""))[1]
+            _header(lines, name, "counter")
+            for labels, value in family.items():
+                lines.append(f"{name}{_labels(dict(zip(label_names, labels)))} {value}")
+        described = set()
+        for name, kind, labels, value in self._collected():
+            if name not in described:
+                described.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    async def handle(self, request: HttpRequest) -> HttpResponse:
+        """HTTP handler serving the exposition on GET /metrics."""
+        if request.path.split("?", 1)[0] != "/metrics":
+            return HttpResponse(404)
+        if request.method != "GET":
+            return HttpResponse(405)
+        return HttpResponse(body=self.exposition().encode(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _snapshot(histogram: Histogram) -> HistogramSnapshot:
+    cumulative = 0
+    buckets = []
+    for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+        cumulative += count
+        buckets.append((bound, cumulative))
+    return HistogramSnapshot(histogram.count, histogram.sum, tuple(buckets))
+
+
+def _header(lines: list[str], name: str, kind: str):
+    description = FAMILIES.get(name, (kind, (), ""))[2]
+    if description:
+        lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+metrics = Metrics()
+
+
+class InstrumentedRateLimiter(BaseRateLimiter[Any]):
+    """Times every Bot API call, the wrapped rate limiter, if any, still decides when calls are made."""
+
+    def __init__(self, rate_limiter: BaseRateLimiter | None):
+        self._rate_limiter = rate_limiter
+
+    async def initialize(self) -> None:
+        if self._rate_limiter is not None:
+            await self._rate_limiter.initialize()
+
+    async def shutdown(self) -> None:
+        if self._rate_limiter is not None:
+            await self._rate_limiter.shutdown()
+
+    async def process_request(
+            self,
+            callback: Callable[..., Coroutine[Any, Any, bool | dict[str, Any] | list[dict[str, Any]]]],
+            args: Any,
+            kwargs: dict[str, Any],
+            endpoint: str,
+            data: dict[str, Any],
+            rate_limit_args: Any,
+    ) -> bool | dict[str, Any] | list[dict[str, Any]]:
+        async def timed(*call_args, **call_kwargs):
+            if not metrics.enabled:
+                return await callback(*call_args, **call_kwargs)
+            start = time.perf_counter()
+            try:
+                return await callback(*call_args, **call_kwargs)
+            except TelegramError as e:
+                metrics.inc(BOT_API_ERRORS, endpoint, type(e).__name__)
+                raise
+            finally:
+                metrics.observe(BOT_API_SECONDS, (endpoint,), time.perf_counter() - start)
+
+        if self._rate_limiter is None:
+            return await timed(*args, **kwargs)
+        return await self._rate_limiter.process_request(timed, args, kwargs, endpoint, data, rate_limit_args)
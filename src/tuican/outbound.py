@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Hashable
+
+from telegram.error import BadRequest, RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# requests that should never wait, e.g. acknowledging callback queries
+_UNTHROTTLED_ENDPOINTS = frozenset({"answerCallbackQuery", "answerInlineQuery"})
+_EDIT_ENDPOINTS = frozenset({"editMessageText", "editMessageReplyMarkup"})
+
+# called when a queued edit isn't sent, None if edits are not queued
+_queue_edits: ContextVar[Callable[[], None] | None] = ContextVar("tuican_queue_edits", default=None)
+
+
+def _ignore():
+    pass
+
+
+@contextmanager
+def queued_edits(on_failure: Callable[[], None] | None = None):
+    """
+    Edits requested in the block that have to wait for their slot are queued and the request returns True
+    at once, the caller doesn't keep the chat busy while the edit waits and a later edit of the message
+    replaces it. Errors of queued edits are logged and on_failure of the latest content's caller is called
+    if the edit failed or was cancelled, "message not modified" is not a failure.
+    """
+    token = _queue_edits.set(on_failure or _ignore)
+    try:
+        yield
+    finally:
+        _queue_edits.reset(token)
+
+
+class _Limiter:
+    """Generic cell rate algorithm: rate requests per second with bursts of up to burst requests."""
+
+    def __init__(self, rate: float, burst: int):
+        self._interval = 1 / rate
+        self._tolerance = self._interval * (burst - 1)
+        self._theoretical_arrival = 0.0
+
+    def reserve(self, now: float) -> float:
+        """Reserves a slot and returns seconds to wait for it."""
+        arrival = max(self._theoretical_arrival, now)
+        self._theoretical_arrival = arrival + self._interval
+        return max(arrival - self._tolerance - now, 0.0)
+
+    def pause(self, until: float):
+        self._theoretical_arrival = max(self._theoretical_arrival, until + self._tolerance)
+
+    def idle(self, now: float) -> bool:
+        return self._theoretical_arrival <= now
+
+
+class _PendingEdit:
+    def __init__(self, request: tuple[Callable, Any, dict[str, Any]], on_failure: Callable[[], None] | None):
+        self.request = request
+        self.on_failure = on_failure
+        self.future = asyncio.get_running_loop().create_future()
+
+
+@dataclass(frozen=True)
+class OutboundStats:
+    queue_depth: int
+    max_queue_depth: int
+    sent: int
+    coalesced: int
+    retries: int
+    mean_wait: float
+    max_wait: float
+
+
+class OutboundScheduler(BaseRateLimiter[None]):
+    """
+    Rate limiter for all Bot API calls of the application.
+
+    Enforces overall and per chat rate limits, coalesces pending edits of the same message
+    so only the latest one is sent and retries requests that failed with RetryAfter.
+    Screens display with queued_edits, so clicks arriving while an edit waits only replace its content.
+
+    Args:
+        overall_rate: requests per second for the whole bot
+        chat_rate: requests per second for a private chat
+        group_rate: requests per second for a group chat
+        burst: number of requests to a chat that are sent without waiting
+        max_retries: how many times a request is retried after RetryAfter
+        backoff: multiplier of the additional delay for consecutive RetryAfter errors
+    """
+
+    def __init__(self,
+                 overall_rate: float = 30,
+                 chat_rate: float = 1,
+                 group_rate: float = 20 / 60,
+                 burst: int = 3,
+                 max_retries: int = 3,
+                 backoff: float = 2.0):
+        self._overall = _Limiter(overall_rate, max(int(overall_rate), 1))
+        self._chat_rate = chat_rate
+        self._group_rate = group_rate
+        self._burst = burst
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._chats: dict[Hashable, _Limiter] = dict()
+        self._pending_edits: dict[Hashable, _PendingEdit] = dict()
+        self._queued: set[asyncio.Task] = set()
+        self._queue_depth = 0
+        self._max_queue_depth = 0
+        self._sent = 0
+        self._coalesced = 0
+        self._retries = 0
+        self._throttled = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        await asyncio.gather(*self._queued, return_exceptions=True)
+
+    async def process_request(
+            self,
+            callback: Callable[..., Coroutine[Any, Any, bool | dict[str, Any] | list[dict[str, Any]]]],
+            args: Any,
+            kwargs: dict[str, Any],
+            endpoint: str,
+            data: dict[str, Any],
+            rate_limit_args: None,
+    ) -> bool | dict[str, Any] | list[dict[str, Any]]:
+        chat_id = data.get("chat_id", data.get("inline_message_id"))
+        if endpoint in _UNTHROTTLED_ENDPOINTS or chat_id is None:
+            return await self._call(callback, args, kwargs, chat_id)
+        if endpoint not in _EDIT_ENDPOINTS:
+            await self._wait(self._reserve(chat_id))
+            return await self._call(callback, args, kwargs, chat_id)
+
+        key = (endpoint, chat_id, data.get("message_id"))
+        on_failure = _queue_edits.get()
+        pending = self._pending_edits.get(key)
+        if pending is not None:
+            # the edit waiting for its slot will send this content instead of its own
+            pending.request = (callback, args, kwargs)
+            pending.on_failure = on_failure
+            self._coalesced += 1
+            return True if on_failure is not None else await asyncio.shield(pending.future)
+        delay = self._reserve(chat_id)
+        if delay == 0:
+            return await self._call(callback, args, kwargs, chat_id)
+        pending = self._pending_edits[key] = _PendingEdit((callback, args, kwargs), on_failure)
+        if on_failure is None:
+            return await self._send_edit(key, pending, delay, chat_id)
+        task = asyncio.create_task(self._send_edit(key, pending, delay, chat_id))
+        self._queued.add(task)
+        task.add_done_callback(lambda _: self._queued_edit_done(task, pending))
+        return True
+
+    async def _send_edit(self, key: Hashable, pending: _PendingEdit, delay: float, chat_id: Hashable):
+        try:
+            await self._wait(delay)
+        finally:
+            # edits arriving from now on wait for their own slot
+            del self._pending_edits[key]
+        try:
+            result = await self._call(*pending.request, chat_id)
+        except Exception as e:
+            pending.future.set_exception(e)
+            # mark exception as retrieved, the caller raises it anyway
+            pending.future.exception()
+            raise
+        pending.future.set_result(result)
+        return result
+
+    def _queued_edit_done(self, task: asyncio.Task, pending: _PendingEdit):
+        self._queued.discard(task)
+        if task.cancelled():
+            failed = True
+        elif task.exception() is None:
+            return
+        else:
+            e = task.exception()
+            failed = not (isinstance(e, BadRequest) and "not modified" in e.message)
+            if failed:
+                logger.warning("queued edit not sent: %s", e, extra={"error": type(e).__name__})
+            else:
+                logger.debug("message not modified: %s", e.message)
+        if failed and pending.on_failure is not None:
+            pending.on_failure()
+
+    def _reserve(self, chat_id: Hashable) -> float:
+        now = time.monotonic()
+        delay = max(self._overall.reserve(now), self._chat_limiter(chat_id, now).reserve(now))
+        self._throttled += 1
+        self._total_wait += delay
+        self._max_wait = max(self._max_wait, delay)
+        return delay
+
+    async def _wait(self, delay: float):
+        if delay > 0:
+            self._queue_depth += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue_depth)
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._queue_depth -= 1
+
+    async def _call(self, callback: Callable, args: Any, kwargs: dict[str, Any], chat_id: Hashable | None):
+        attempt = 0
+        while True:
+            try:
+                result = await callback(*args, **kwargs)
+                self._sent += 1
+                return result
+            except RetryAfter as e:
+                if attempt >= self._max_retries:
+                    raise
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                delay = retry_after + (self._backoff ** attempt - 1)
+                now = time.monotonic()
+                if chat_id is None:
+                    self._overall.pause(now + delay)
+                else:
+                    self._chat_limiter(chat_id, now).pause(now + delay)
+                attempt += 1
+                self._retries += 1
+                await asyncio.sleep(delay)
+
+    def _chat_limiter(self, chat_id: Hashable, now: float) -> _Limiter:
+        limiter = self._chats.get(chat_id)
+        if limiter is None:
+            if len(self._chats) > 1024:
+                self._chats = {chat: limiter for chat, limiter in self._chats.items() if not limiter.idle(now)}
+            is_group = isinstance(chat_id, int) and chat_id < 0
+            limiter = self._chats[chat_id] = _Limiter(self._group_rate if is_group else self._chat_rate, self._burst)
+        return limiter
+
+    @property
+    def stats(self) -> OutboundStats:
+        return OutboundStats(
+            queue_depth=self._queue_depth,
+            max_queue_depth=self._max_queue_depth,
+            sent=self._sent,
+            coalesced=self._coalesced,
+            retries=self._retries,
+            mean_wait=self._total_wait / self._throttled if self._throttled else 0.0,
+            max_wait=self._max_wait
+        )
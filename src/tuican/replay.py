@@ -0,0 +1,128 @@
+"""
+Replay of a journal written by UpdateJournal against an application without network.
+
+    python -m tuican.replay updates.jsonl start=examples.press_counter:ButtonScreen [--speed 10]
+
+Screens are given as command=module:factory. --speed 1 keeps the original pauses between updates,
+10 replays ten times faster and 0, the default, sends every update as soon as the previous one is handled.
+Bot api calls are answered by tuican.testing.RecordingRequest.
+Generated callback data differs between processes, a recorded press is sent to the button
+at the same position of the replayed message.
+"""
+import argparse
+import asyncio
+import importlib
+import statistics
+import time
+from dataclasses import dataclass
+
+from .application import Application
+from .journal import read_journal
+from .testing import RecordingRequest
+
+
+@dataclass(frozen=True)
+class ReplayStats:
+    updates: int
+    elapsed: float
+    # seconds from the scheduled arrival until the update is handled
+    p50: float
+    p95: float
+    p99: float
+    # largest delay of an update behind its scheduled arrival
+    max_lag: float
+    api_calls: int
+
+
+def _percentile(values: list[float], p: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+def _remap_callback(update: dict, request: RecordingRequest):
+    query = update.get("callback_query")
+    message = query.get("message") if query else None
+    if not message:
+        return
+    recorded = message.get("reply_markup", {}).get("inline_keyboard", [])
+    position = next(((r, c) for r, row in enumerate(recorded) for c, button in enumerate(row)
+                     if button.get("callback_data") == query.get("data")), None)
+    if position is None:
+        return
+    chat_id = message["chat"]["id"]
+    # the first press of a recorded message hits the message last sent by the replay
+    replayed = request.messages.get((chat_id, message["message_id"])) or \
+        request.messages.get((chat_id, request.last_message_ids.get(chat_id)))
+    if replayed is None or "reply_markup" not in replayed:
+        return
+    row, column = position
+    keyboard = replayed["reply_markup"]["inline_keyboard"]
+    if row < len(keyboard) and column < len(keyboard[row]) and "callback_data" in keyboard[row][column]:
+        query["data"] = keyboard[row][column]["callback_data"]
+
+
+async def replay(application: Application, path: str, speed: float = 0.0,
+                 request: RecordingRequest | None = None) -> ReplayStats:
+    request = request if request is not None else RecordingRequest(record=False)
+    application.request(request)
+    await application.start()
+    latencies: list[float] = []
+    max_lag = 0.0
+
+    async def handle(update: dict, scheduled: float):
+        nonlocal max_lag
+        max_lag = max(max_lag, time.perf_counter() - scheduled)
+        _remap_callback(update, request)
+        await application.process_update(update)
+        latencies.append(time.perf_counter() - scheduled)
+
+    start = time.perf_counter()
+    try:
+        if speed <= 0:
+            for _, update in read_journal(path):
+                await handle(update, time.perf_counter())
+        else:
+            tasks = []
+            first = None
+            for arrival, update in read_journal(path):
+                first = arrival if first is None else first
+                scheduled = start + (arrival - first) / speed
+                await asyncio.sleep(max(scheduled - time.perf_counter(), 0))
+                tasks.append(asyncio.create_task(handle(update, scheduled)))
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    finally:
+        await application.stop()
+    return ReplayStats(len(latencies), elapsed, _percentile(latencies, 50), _percentile(latencies, 95),
+                       _percentile(latencies, 99), max_lag, request.counts.total())
+
+
+def _load_factory(spec: str):
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m tuican.replay")
+    parser.add_argument("journal")
+    parser.add_argument("screens", nargs="+", metavar="command=module:factory")
+    parser.add_argument("--speed", type=float, default=0.0)
+    parser.add_argument("--rate-limit", action="store_true", help="keep the default OutboundScheduler")
+    args = parser.parse_args()
+
+    screens = dict()
+    for screen in args.screens:
+        command, _, spec = screen.partition("=")
+        screens[command] = _load_factory(spec)
+    application = Application("0:replay", screens)
+    if not args.rate_limit:
+        application.rate_limiter(None)
+    stats = asyncio.run(replay(application, args.journal, args.speed))
+    print(f"updates {stats.updates} in {stats.elapsed:.2f}s, {stats.updates / max(stats.elapsed, 1e-9):.1f} updates/s")
+    print(f"latency ms p50 {stats.p50 * 1000:.2f} p95 {stats.p95 * 1000:.2f} p99 {stats.p99 * 1000:.2f}, "
+          f"max lag ms {stats.max_lag * 1000:.2f}, bot api calls {stats.api_calls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from telegram import Update
+
+
+def get_session_key(update: Update) -> int:
+    # sessions belong to users, a user writing in a group and a private chat changes the same screen
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    raise RuntimeError("no user id")
+
+
+class SessionScheduler:
+    """
+    Serializes processing of updates that belong to the same session while
+    updates of different sessions run concurrently.
+
+    asyncio.Lock wakes up waiters in FIFO order, so updates of one session are
+    processed in the order they were received.
+    """
+
+    def __init__(self):
+        # session key -> (lock, number of updates holding or waiting for the lock, number of updates since it was idle)
+        self._locks: dict[int, tuple[asyncio.Lock, int, int]] = dict()
+
+    @asynccontextmanager
+    async def serialize(self, key: int):
+        lock, users, arrivals = self._locks.get(key, (None, 0, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, users + 1, arrivals + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users, arrivals = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1, arrivals)
+
+    def pending(self, key: int) -> int:
+        """Number of updates of the session that are being processed or waiting."""
+        return self._locks.get(key, (None, 0, 0))[1]
+
+    def arrivals(self, key: int) -> int:
+        """Number of updates of the session that entered serialize since the session was idle."""
+        return self._locks.get(key, (None, 0, 0))[2]
+
+    @property
+    def active_sessions(self) -> int:
+        return len(self._locks)
@@ -0,0 +1,21 @@
+from .cache import EvictionReason, SessionCache, SessionCacheStats, SessionKey, estimate_size
+from .persistence import SessionPersistence
+from .store import InMemoryKeyValueClient, KeyValueClient, KeyValueSessionStore, MemorySessionStore, \
+    PickleSerializer, SQLiteSessionStore, SessionSerializer, SessionStore
+
+__all__ = [
+    'EvictionReason',
+    'SessionCache',
+    'SessionCacheStats',
+    'SessionKey',
+    'estimate_size',
+    'SessionPersistence',
+    'SessionStore',
+    'SessionSerializer',
+    'PickleSerializer',
+    'MemorySessionStore',
+    'SQLiteSessionStore',
+    'KeyValueClient',
+    'KeyValueSessionStore',
+    'InMemoryKeyValueClient'
+]
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from enum import Enum
+from types import FunctionType, MethodType, ModuleType
+from typing import Any, Callable
+
+from telegram import Bot
+
+from ..components import Screen, SharedComponent
+from ..components.shared import Frozen
+
+SessionKey = tuple[str, int]
+
+
+class EvictionReason(str, Enum):
+    CAPACITY = "capacity"
+    TTL = "ttl"
+    MEMORY = "memory"
+
+
+EvictionCallback = Callable[[SessionKey, Screen, EvictionReason], None]
+
+# objects that are shared between sessions or owned by the library, they are not counted.
+# telegram objects a screen keeps, like rendered buttons, are counted, the bot they may refer to is not.
+# Loops, locks and tasks lead to the event loop and everything scheduled on it
+_SKIPPED_TYPES = (type, ModuleType, FunctionType, MethodType, Bot, SharedComponent, Frozen,
+                  asyncio.AbstractEventLoop, asyncio.Future, asyncio.Lock, asyncio.Event, asyncio.Condition,
+                  asyncio.Semaphore, asyncio.Queue, type(threading.Lock()), type(threading.RLock()), Executor,
+                  logging.Logger)
+
+
+def estimate_size(obj: Any, max_depth: int = 32, max_objects: int = 50_000) -> int:
+    """
+    Approximate number of bytes retained by obj and everything reachable from it.
+    The walk stops at max_depth references from obj and after max_objects objects, so a screen
+    referring to a large shared structure isn't charged for all of it.
+    """
+    seen = set()
+    stack = [(obj, 0)]
+    size = 0
+    while stack and len(seen) < max_objects:
+        current, depth = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIPPED_TYPES):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, (str, bytes, int, float, bool)) or current is None or depth >= max_depth:
+            continue
+        depth += 1
+        if isinstance(current, dict):
+            stack.extend((key, depth) for key in current.keys())
+            stack.extend((value, depth) for value in current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend((item, depth) for item in current)
+        if hasattr(current, "__dict__"):
+            stack.append((current.__dict__, depth))
+        for cls in type(current).__mro__:
+            for slot in cls.__dict__.get("__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append((getattr(current, slot), depth))
+    return size
+
+
+@dataclass(frozen=True)
+class SessionCacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    resident_sessions: int
+    resident_bytes: int
+
+
+class SessionCache:
+    """
+    LRU cache of user screens with optional capacity, idle ttl and approximate memory budget.
+
+    Args:
+        max_entries: maximum number of resident sessions, None for unbounded
+        ttl: seconds a session may stay idle before it is evicted, None to keep forever
+        max_bytes: approximate memory budget for all resident sessions, None for unbounded
+        sizeof: function estimating the size of a screen, only used when max_bytes is set
+    """
+
+    def __init__(self,
+                 max_entries: int | None = None,
+                 ttl: float | None = None,
+                 max_bytes: int | None = None,
+                 sizeof: Callable[[Screen], int] = estimate_size,
+                 clock: Callable[[], float] = time.monotonic):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._clock = clock
+        # key -> (screen, last access time, size, display count of the screen when it was measured)
+        self._entries: OrderedDict[SessionKey, tuple[Screen, float, int, int]] = OrderedDict()
+        self._bytes = 0
+        self._eviction_callbacks: list[EvictionCallback] = []
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def on_evict(self, callback: EvictionCallback):
+        self._eviction_callbacks.append(callback)
+        return self
+
+    def get(self, key: SessionKey) -> Screen | None:
+        self._expire()
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        screen, _, size, measured = entry
+        self._entries[key] = (screen, self._clock(), size, measured)
+        self._entries.move_to_end(key)
+        return screen
+
+    def put(self, key: SessionKey, screen: Screen):
+        self.pop(key)
+        size = self._sizeof(screen) if self._max_bytes is not None else 0
+        self._entries[key] = (screen, self._clock(), size, screen.display_count)
+        self._bytes += size
+        self._expire()
+        while self._max_entries is not None and len(self._entries) > self._max_entries:
+            self._evict_oldest(EvictionReason.CAPACITY)
+        # the newest session is kept even if it alone exceeds the budget
+        while self._max_bytes is not None and self._bytes > self._max_bytes and len(self._entries) > 1:
+            self._evict_oldest(EvictionReason.MEMORY)
+
+    def resize(self, key: SessionKey):
+        """Measure the session again if it was displayed since the last measurement and enforce the budget."""
+        if self._max_bytes is None:
+            return
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        screen, last_access, size, measured = entry
+        if screen.display_count == measured:
+            return
+        new_size = self._sizeof(screen)
+        self._entries[key] = (screen, last_access, new_size, screen.display_count)
+        self._bytes += new_size - size
+        # the changed session is kept, it's the one in use
+        self._entries.move_to_end(key)
+        while self._bytes > self._max_bytes and len(self._entries) > 1:
+            self._evict_oldest(EvictionReason.MEMORY)
+
+    def pop(self, key: SessionKey) -> Screen | None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._bytes -= entry[2]
+        return entry[0]
+
+    def expire(self):
+        """Evict every session that has been idle longer than ttl."""
+        self._expire()
+
+    def _expire(self):
+        if self._ttl is None:
+            return
+        deadline = self._clock() - self._ttl
+        # entries are ordered by last access so expired ones are always at the front
+        while self._entries:
+            _, (_, last_access, _, _) = next(iter(self._entries.items()))
+            if last_access > deadline:
+                break
+            self._evict_oldest(EvictionReason.TTL)
+
+    def _evict_oldest(self, reason: EvictionReason):
+        key, (screen, _, size, _) = self._entries.popitem(last=False)
+        self._bytes -= size
+        self._evictions += 1
+        for callback in self._eviction_callbacks:
+            callback(key, screen, reason)
+
+    def __contains__(self, key: SessionKey) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> SessionCacheStats:
+        return SessionCacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            resident_sessions=len(self._entries),
+            resident_bytes=self._bytes
+        )
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import pickle
+from typing import Callable
+
+from ..components import Screen
+from .cache import SessionKey
+from .store import PickleSerializer, SessionSerializer, SessionStore
+
+logger = logging.getLogger(__name__)
+
+
+def _screen_key(key: SessionKey) -> str:
+    command, user_id = key
+    return f"screen:{command}:{user_id}"
+
+
+def _command_key(user_id: int) -> str:
+    return f"command:{user_id}"
+
+
+class SessionPersistence:
+    """
+    Write-behind persistence of sessions.
+
+    Changed sessions are only remembered and serialized in batches every flush_interval seconds,
+    so the latest state of a session is written once per flush however many updates it received.
+    Sessions missing in the cache are read through from the store.
+
+    With the default PickleSerializer loading a session can run any code stored in it, use a store only
+    the bot can write to.
+    """
+
+    def __init__(self,
+                 store: SessionStore,
+                 serializer: SessionSerializer | None = None,
+                 flush_interval: float = 5.0,
+                 max_batch_size: int = 500):
+        self._store = store
+        self._serializer = serializer or PickleSerializer()
+        self._flush_interval = flush_interval
+        self._max_batch_size = max_batch_size
+        # store key -> screen, encoded command or None for deletion, waiting to be written
+        self._pending: dict[str, Screen | bytes | None] = dict()
+        self._flusher: asyncio.Task | None = None
+
+    def check_screens(self, factories: dict[str, Callable[[], Screen]]):
+        """Raises TypeError if a new screen of a command can't be serialized, its sessions would never be saved."""
+        for command, factory in factories.items():
+            try:
+                self._serializer.dumps(factory())
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                raise TypeError(f"sessions of /{command} can't be persisted: {e}") from e
+
+    async def load_screen(self, key: SessionKey) -> Screen | None:
+        store_key = _screen_key(key)
+        if store_key in self._pending:
+            pending = self._pending[store_key]
+            return pending if isinstance(pending, Screen) else None
+        data = await self._store.get(store_key)
+        if data is None:
+            return None
+        try:
+            return self._serializer.loads(data)
+        except (pickle.UnpicklingError, AttributeError, ImportError, EOFError) as e:
+            logger.warning("session %s can't be restored: %s", key, e, extra={"error": type(e).__name__})
+            return None
+
+    async def load_command(self, user_id: int) -> str | None:
+        store_key = _command_key(user_id)
+        data = self._pending[store_key] if store_key in self._pending else await self._store.get(store_key)
+        return data.decode() if data is not None else None
+
+    def screen_changed(self, key: SessionKey, screen: Screen):
+        self._pending[_screen_key(key)] = screen
+
+    def screen_removed(self, key: SessionKey):
+        self._pending[_screen_key(key)] = None
+
+    def command_changed(self, user_id: int, command: str):
+        self._pending[_command_key(user_id)] = command.encode()
+
+    async def flush(self):
+        # sessions changed during the flush are left for the next one
+        keys = list(self._pending)
+        for start in range(0, len(keys), self._max_batch_size):
+            batch = {key: self._pending.pop(key) for key in keys[start:start + self._max_batch_size]
+                     if key in self._pending}
+            items = dict()
+            for key, value in batch.items():
+                if isinstance(value, Screen):
+                    try:
+                        items[key] = self._serializer.dumps(value)
+                    except (pickle.PicklingError, TypeError, AttributeError) as e:
+                        logger.error("session %s can't be saved: %s", key, e, extra={
+                            "screen": type(value).__name__, "error": type(e).__name__})
+                elif value is not None:
+                    items[key] = value
+            deleted = [key for key, value in batch.items() if value is None]
+            try:
+                if items:
+                    await self._store.put_many(items)
+                if deleted:
+                    await self._store.delete_many(deleted)
+            except Exception:
+                # keep the batch unless the sessions changed again meanwhile
+                for key, value in batch.items():
+                    self._pending.setdefault(key, value)
+                raise
+
+    async def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+        await self._store.close()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("sessions were not flushed: %s", e, extra={"error": type(e).__name__})
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
@@ -0,0 +1,151 @@
+import asyncio
+import pickle
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import Protocol
+
+from ..components import Screen
+
+
+class SessionSerializer(Protocol):
+    def dumps(self, screen: Screen) -> bytes:
+        ...
+
+    def loads(self, data: bytes) -> Screen:
+        ...
+
+
+class PickleSerializer:
+    """
+    Serializes screens with pickle, screens and components define __getstate__ to drop transient state.
+    Callbacks have to be picklable: methods and module level functions are, lambdas are not.
+    Unpickling runs code chosen by whoever wrote the data, load only data the bot wrote itself.
+    """
+
+    def __init__(self, protocol: int = pickle.HIGHEST_PROTOCOL):
+        self._protocol = protocol
+
+    def dumps(self, screen: Screen) -> bytes:
+        return pickle.dumps(screen, self._protocol)
+
+    def loads(self, data: bytes) -> Screen:
+        return pickle.loads(data)
+
+
+class SessionStore(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def put_many(self, items: dict[str, bytes]):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_many(self, keys: list[str]):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self):
+        self._data: dict[str, bytes] = dict()
+
+    async def get(self, key: str) -> bytes | None:
+        return self._data.get(key)
+
+    async def put_many(self, items: dict[str, bytes]):
+        self._data.update(items)
+
+    async def delete_many(self, keys: list[str]):
+        for key in keys:
+            self._data.pop(key, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a SQLite database, queries run in a worker thread."""
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+        self._connection.commit()
+        self._lock = asyncio.Lock()
+
+    async def get(self, key: str) -> bytes | None:
+        async with self._lock:
+            row = await asyncio.to_thread(self._get, key)
+        return row[0] if row is not None else None
+
+    async def put_many(self, items: dict[str, bytes]):
+        async with self._lock:
+            await asyncio.to_thread(self._put_many, list(items.items()))
+
+    async def delete_many(self, keys: list[str]):
+        async with self._lock:
+            await asyncio.to_thread(self._delete_many, [(key,) for key in keys])
+
+    async def close(self):
+        async with self._lock:
+            await asyncio.to_thread(self._connection.close)
+
+    def _get(self, key: str):
+        return self._connection.execute("SELECT value FROM sessions WHERE key = ?", (key,)).fetchone()
+
+    def _put_many(self, items: list[tuple[str, bytes]]):
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO sessions (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                items)
+
+    def _delete_many(self, keys: list[tuple[str]]):
+        with self._connection:
+            self._connection.executemany("DELETE FROM sessions WHERE key = ?", keys)
+
+
+class KeyValueClient(Protocol):
+    """Subset of an async key-value client, e.g. redis.asyncio.Redis."""
+
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    async def set(self, key: str, value: bytes):
+        ...
+
+    async def delete(self, *keys: str):
+        ...
+
+
+class InMemoryKeyValueClient:
+    """Local stand-in for a key-value server."""
+
+    def __init__(self):
+        self._data: dict[str, bytes] = dict()
+
+    async def get(self, key: str) -> bytes | None:
+        return self._data.get(key)
+
+    async def set(self, key: str, value: bytes):
+        self._data[key] = value
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+
+class KeyValueSessionStore(SessionStore):
+    def __init__(self, client: KeyValueClient, prefix: str = "tuican:"):
+        self._client = client
+        self._prefix = prefix
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._client.get(self._prefix + key)
+
+    async def put_many(self, items: dict[str, bytes]):
+        await asyncio.gather(*(self._client.set(self._prefix + key, value) for key, value in items.items()))
+
+    async def delete_many(self, keys: list[str]):
+        if keys:
+            await self._client.delete(*(self._prefix + key for key in keys))
@@ -0,0 +1,155 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+import multiprocessing
+from multiprocessing.process import BaseProcess
+from queue import Full
+from typing import Callable
+
+from telegram import Update
+from telegram.ext import ContextTypes, TypeHandler
+
+from .application import Application
+from .components.screen import StartScreenProtocol
+from .outbound import OutboundScheduler
+
+logger = logging.getLogger(__name__)
+
+# telegram's limit for messages sent by a bot per second, shared by the workers
+_OVERALL_RATE = 30
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to shards, replicas virtual nodes per shard smooth the distribution."""
+
+    def __init__(self, shards: int, replicas: int = 100):
+        points = sorted((self._hash(f"{shard}:{replica}"), shard)
+                        for shard in range(shards) for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key: int | str) -> int:
+        index = bisect.bisect(self._hashes, self._hash(str(key))) % len(self._hashes)
+        return self._shards[index]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest())
+
+
+def _run_worker(token: str,
+                screens: dict[str, StartScreenProtocol],
+                workers: int,
+                queue: multiprocessing.Queue,
+                configure: Callable[[Application], Application | None] | None):
+    app = Application(token, screens).rate_limiter(OutboundScheduler(overall_rate=_OVERALL_RATE / workers))
+    if configure is not None:
+        app = configure(app) or app
+    asyncio.run(app.serve_updates(lambda: asyncio.to_thread(queue.get)))
+
+
+class ShardedApplication(Application):
+    """
+    Front process receiving updates (polling or webhook) and routing them to worker processes.
+
+    Users are assigned to workers by a consistent hash of their id, every worker owns the sessions
+    of its users and receives their updates in order through its own queue. A worker that died
+    is restarted on the same queue, so it keeps its users, updates it was processing are lost.
+
+    Screens and configure are passed to the workers, they have to be picklable: defined on
+    module level of a module that is importable, scripts should start the application under
+    `if __name__ == "__main__":`. configure is called with the worker's Application to set up
+    session cache, persistence and other options.
+
+    On shutdown every worker finishes the updates in its queue, a worker that doesn't exit within
+    shutdown_timeout seconds is terminated.
+    """
+
+    def __init__(self,
+                 token: str,
+                 screens: dict[str, StartScreenProtocol],
+                 workers: int = multiprocessing.cpu_count(),
+                 configure: Callable[[Application], Application | None] | None = None,
+                 queue_size: int = 10_000,
+                 supervise_interval: float = 1.0,
+                 shutdown_timeout: float = 10.0):
+        super().__init__(token, screens)
+        self._token = token
+        self._workers = workers
+        self._configure = configure
+        self._ring = HashRing(workers)
+        self._context = multiprocessing.get_context("spawn")
+        self._queues = [self._context.Queue(queue_size) for _ in range(workers)]
+        self._processes: list[BaseProcess | None] = [None] * workers
+        self._supervise_interval = supervise_interval
+        self._shutdown_timeout = shutdown_timeout
+        self._supervisor: asyncio.Task | None = None
+        self._restarts = 0
+        # the front sends nothing but the bot commands
+        self.rate_limiter(None)
+
+    def _add_handlers(self):
+        self._app.add_handler(TypeHandler(Update, self.route))
+
+    async def route(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user or update.effective_chat
+        if user is None:
+            return
+        queue = self._queues[self._ring.shard_for(user.id)]
+        data = update.to_dict()
+        try:
+            queue.put_nowait(data)
+        except Full:
+            # a full queue blocks the front, which slows down receiving updates
+            await asyncio.to_thread(queue.put, data)
+
+    async def _on_post_init(self, application):
+        for shard in range(self._workers):
+            self._start_worker(shard)
+        self._supervisor = asyncio.create_task(self._supervise())
+        await super()._on_post_init(application)
+
+    async def _on_post_shutdown(self, application):
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+        for queue in self._queues:
+            try:
+                queue.put_nowait(None)
+            except Full:
+                try:
+                    await asyncio.to_thread(queue.put, None, timeout=self._shutdown_timeout)
+                except Full:
+                    # the worker is stuck, it's terminated below
+                    pass
+        for shard, process in enumerate(self._processes):
+            if process is None:
+                continue
+            await asyncio.to_thread(process.join, self._shutdown_timeout)
+            if process.is_alive():
+                logger.warning("worker %d didn't exit in %ss, terminating", shard, self._shutdown_timeout)
+                process.terminate()
+                await asyncio.to_thread(process.join)
+        await super()._on_post_shutdown(application)
+
+    def _start_worker(self, shard: int):
+        process = self._context.Process(
+            target=_run_worker,
+            args=(self._token, self._screen_factories, self._workers, self._queues[shard], self._configure),
+            name=f"tuican-worker-{shard}",
+            daemon=True)
+        process.start()
+        self._processes[shard] = process
+
+    async def _supervise(self):
+        while True:
+            await asyncio.sleep(self._supervise_interval)
+            for shard, process in enumerate(self._processes):
+                if not process.is_alive():
+                    logger.warning("worker %d exited with code %s, restarting", shard, process.exitcode)
+                    self._restarts += 1
+                    self._start_worker(shard)
+
+    @property
+    def restarts(self) -> int:
+        return self._restarts
@@ -0,0 +1,304 @@
+"""
+Running an Application without telegram, for tests and benchmarks.
+
+    runner = OfflineRunner(Application("0:offline", {'start': MyScreen}).rate_limiter(None))
+    await runner.start()
+    await runner.send("/start")
+    await runner.click("Click me")
+    assert runner.request.text_of(runner.chat_id) == "Hello world!"
+    await runner.stop()
+"""
+import asyncio
+import itertools
+import json
+import random
+from collections import Counter
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Any
+from urllib.parse import parse_qsl
+
+from telegram.request import BaseRequest, RequestData
+
+from .application import Application
+from .httpserver import HttpRequest, HttpResponse, start_http_server
+
+BOT_ID = 1
+
+
+@dataclass(frozen=True)
+class ApiCall:
+    endpoint: str
+    parameters: dict[str, Any]
+
+
+class RecordingRequest(BaseRequest):
+    """
+    Bot api transport that records requests instead of sending them and answers with
+    plausible results. Keeps text and keyboard of sent messages, so callbacks can be built from them.
+    """
+
+    def __init__(self, record: bool = True):
+        self.calls: list[ApiCall] = []
+        # endpoint -> number of calls, also counted if calls are not recorded
+        self.counts: Counter[str] = Counter()
+        # calls are not kept if False, e.g. in long benchmarks
+        self.record = record
+        self._message_ids = itertools.count(1)
+        # (chat id, message id) -> parameters of the last send or edit
+        self.messages: dict[tuple[int, int], dict[str, Any]] = dict()
+        # chat id -> id of the last sent or edited message
+        self.last_message_ids: dict[int, int] = dict()
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def do_request(self, url: str, method: str, request_data: RequestData | None = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        parameters = request_data.parameters if request_data is not None else {}
+        self.counts[endpoint] += 1
+        if self.record:
+            self.calls.append(ApiCall(endpoint, parameters))
+        return 200, json.dumps({"ok": True, "result": self.result(endpoint, parameters)}).encode()
+
+    def result(self, endpoint: str, parameters: dict[str, Any]) -> Any:
+        if endpoint == "getMe":
+            return {"id": BOT_ID, "is_bot": True, "first_name": "tuican", "username": "tuican_bot"}
+        if endpoint in ("sendMessage", "editMessageText"):
+            chat_id = parameters.get("chat_id")
+            if chat_id is None:
+                # inline messages are edited without a chat
+                return True
+            message_id = parameters.get("message_id") or next(self._message_ids)
+            self.messages[(chat_id, message_id)] = parameters
+            self.last_message_ids[chat_id] = message_id
+            return {"message_id": message_id, "date": 0, "chat": {"id": chat_id, "type": "private"},
+                    "text": parameters.get("text")}
+        if endpoint == "deleteMessage":
+            self.messages.pop((parameters.get("chat_id"), parameters.get("message_id")), None)
+        return True
+
+    def text_of(self, chat_id: int) -> str | None:
+        message = self.messages.get((chat_id, self.last_message_ids.get(chat_id)))
+        return None if message is None else message.get("text")
+
+    def keyboard_of(self, chat_id: int) -> list[list[dict[str, Any]]]:
+        message = self.messages.get((chat_id, self.last_message_ids.get(chat_id)))
+        if message is None or "reply_markup" not in message:
+            return []
+        return message["reply_markup"]["inline_keyboard"]
+
+    def count(self, endpoint: str) -> int:
+        return self.counts[endpoint]
+
+
+class UpdateFactory:
+    """Builds update JSON dicts of one private chat, as received from telegram."""
+
+    def __init__(self, user_id: int = 1):
+        self.user_id = user_id
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1_000_000)
+
+    def _user(self) -> dict:
+        return {"id": self.user_id, "is_bot": False, "first_name": "user"}
+
+    def _chat(self) -> dict:
+        return {"id": self.user_id, "type": "private"}
+
+    def message(self, text: str) -> dict:
+        message = {"message_id": next(self._message_ids), "date": 0, "chat": self._chat(), "from": self._user(),
+                   "text": text}
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split(" ")[0])}]
+        return {"update_id": next(self._update_ids), "message": message}
+
+    def callback(self, data: str, message_id: int, keyboard: list[list[dict[str, Any]]] | None = None) -> dict:
+        update_id = next(self._update_ids)
+        message = {"message_id": message_id, "date": 0, "chat": self._chat(), "text": ""}
+        if keyboard:
+            # telegram sends the keyboard of the pressed message
+            message["reply_markup"] = {"inline_keyboard": keyboard}
+        return {"update_id": update_id, "callback_query": {
+            "id": f"{self.user_id}-{update_id}", "chat_instance": str(self.user_id), "data": data, "from": self._user(),
+            "message": message}}
+
+
+class OfflineRunner:
+    """Starts an Application with a RecordingRequest and sends updates of one user to it."""
+
+    def __init__(self, application: Application, request: RecordingRequest | None = None, user_id: int = 1):
+        self.application = application
+        self.request = request if request is not None else RecordingRequest()
+        self.updates = UpdateFactory(user_id)
+        application.request(self.request)
+
+    @property
+    def chat_id(self) -> int:
+        return self.updates.user_id
+
+    async def start(self):
+        await self.application.start()
+
+    async def stop(self):
+        await self.application.stop()
+
+    async def send(self, text: str):
+        """Send a text message, a command if it starts with /."""
+        await self.application.process_update(self.updates.message(text))
+
+    async def click(self, button: str | int):
+        """Press a button of the last message by its text or position in the keyboard."""
+        message_id = self.request.last_message_ids.get(self.chat_id)
+        keyboard = self.request.keyboard_of(self.chat_id)
+        buttons = [b for row in keyboard for b in row]
+        if isinstance(button, int):
+            pressed = buttons[button]
+        else:
+            pressed = next((b for b in buttons if b["text"] == button), None)
+            if pressed is None:
+                raise LookupError(f"no button {button!r} in {[b['text'] for b in buttons]}")
+        await self.application.process_update(self.updates.callback(pressed["callback_data"], message_id, keyboard))
+
+
+# methods answered with 429 by FakeBotApiServer if too_many_requests is set
+THROTTLED_METHODS = frozenset({"sendMessage", "editMessageText", "deleteMessage", "answerCallbackQuery"})
+# form fields PTB sends JSON encoded, strings are sent as they are
+_INT_FIELDS = frozenset({"chat_id", "message_id", "offset", "limit", "timeout"})
+_JSON_FIELDS = frozenset({"reply_markup", "allowed_updates", "commands"})
+
+
+class FakeBotApiServer:
+    """
+    Local HTTP stand-in for the bot api, an application connects to it with
+    Application.base_url(server.base_url) and polls updates pushed with push_update.
+
+    Answers are built by a RecordingRequest, available as api.
+
+    Args:
+        latency: seconds every bot method but getUpdates takes to answer
+        too_many_requests: share of THROTTLED_METHODS calls answered with 429
+        retry_after: retry_after of the injected 429 answers
+    """
+
+    def __init__(self, latency: float = 0.0, too_many_requests: float = 0.0, retry_after: int = 1,
+                 seed: int | None = None):
+        self.api = RecordingRequest(record=False)
+        self._latency = latency
+        self._too_many_requests = too_many_requests
+        self._retry_after = retry_after
+        self._random = random.Random(seed)
+        self._update_ids = itertools.count(1)
+        self._updates: list[dict] = []
+        self._new_updates = asyncio.Event()
+        self._polling_stopped = False
+        # chat id or callback query id -> futures of wait_for and wait_for_answer
+        self._waiters: dict[int, list[tuple[frozenset[str], asyncio.Future]]] = dict()
+        self.polling = asyncio.Event()
+        self.calls: Counter[str] = Counter()
+        self.throttled = 0
+        self._server: asyncio.Server | None = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = await start_http_server(self.handle, host, port)
+        return self
+
+    async def stop(self):
+        self._server.close()
+        self._server.close_clients()
+        await self._server.wait_closed()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/bot"
+
+    def push_update(self, update: dict):
+        """Queue an update for getUpdates, its update_id is replaced to keep ids ordered."""
+        update["update_id"] = next(self._update_ids)
+        self._updates.append(update)
+        self._new_updates.set()
+
+    def stop_polling(self):
+        """Answer getUpdates at once from now on, so the bot doesn't wait for a long poll on shutdown."""
+        self._polling_stopped = True
+        self._new_updates.set()
+
+    async def wait_for(self, chat_id: int, endpoints: frozenset[str] = frozenset({"sendMessage", "editMessageText"}),
+                       timeout: float | None = None):
+        """Wait until the bot successfully calls one of the endpoints for the chat."""
+        await self._wait(chat_id, endpoints, timeout)
+
+    async def wait_for_answer(self, callback_query_id: str, timeout: float | None = None):
+        await self._wait(callback_query_id, frozenset({"answerCallbackQuery"}), timeout)
+
+    async def _wait(self, key: int | str, endpoints: frozenset[str], timeout: float | None):
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, []).append((endpoints, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        finally:
+            waiters = self._waiters.get(key)
+            if waiters is not None:
+                waiters[:] = [waiter for waiter in waiters if waiter[1] is not future]
+                if not waiters:
+                    del self._waiters[key]
+
+    async def handle(self, request: HttpRequest) -> HttpResponse:
+        endpoint = request.path.split("?", 1)[0].rsplit("/", 1)[-1]
+        parameters = self._parse(request)
+        self.calls[endpoint] += 1
+        if endpoint == "getUpdates":
+            return self._answer(await self._get_updates(parameters))
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        if endpoint in THROTTLED_METHODS and self._random.random() < self._too_many_requests:
+            self.throttled += 1
+            return HttpResponse(HTTPStatus.TOO_MANY_REQUESTS, json.dumps({
+                "ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {self._retry_after}",
+                "parameters": {"retry_after": self._retry_after}}).encode(), "application/json")
+        result = self.api.result(endpoint, parameters)
+        self._notify(parameters.get("chat_id", parameters.get("callback_query_id")), endpoint)
+        return self._answer(result)
+
+    @staticmethod
+    def _parse(request: HttpRequest) -> dict[str, Any]:
+        if request.headers.get("content-type", "").startswith("application/json"):
+            return json.loads(request.body or b"{}")
+        parameters = dict()
+        for name, value in parse_qsl(request.body.decode()):
+            if name in _INT_FIELDS:
+                value = int(value)
+            elif name in _JSON_FIELDS:
+                value = json.loads(value)
+            parameters[name] = value
+        return parameters
+
+    @staticmethod
+    def _answer(result: Any) -> HttpResponse:
+        return HttpResponse(body=json.dumps({"ok": True, "result": result}).encode(), content_type="application/json")
+
+    async def _get_updates(self, parameters: dict[str, Any]) -> list[dict]:
+        self.polling.set()
+        offset = parameters.get("offset", 0)
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and not self._polling_stopped:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), parameters.get("timeout", 0))
+            except TimeoutError:
+                pass
+        return self._updates[:parameters.get("limit", 100)]
+
+    def _notify(self, key: int | str | None, endpoint: str):
+        for endpoints, future in self._waiters.get(key, ()):
+            if endpoint in endpoints and not future.done():
+                future.set_result(endpoint)
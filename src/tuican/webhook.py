@@ -0,0 +1,79 @@
+import asyncio
+import hmac
+import json
+from dataclasses import dataclass
+from http import HTTPStatus
+
+from telegram import Update
+from telegram.ext import Application as TgApplication
+
+from .httpserver import HttpRequest, HttpResponse, start_http_server
+
+SECRET_TOKEN_HEADER = "x-telegram-bot-api-secret-token"
+
+
+@dataclass(frozen=True)
+class WebhookStats:
+    received: int
+    rejected: int
+    unauthorized: int
+    queue_size: int
+
+
+class WebhookServer:
+    """
+    Receives updates posted by telegram and puts them into the application's update queue.
+
+    The update queue is bounded, when it is full the request waits for a free slot,
+    which slows down telegram's delivery. If no slot is freed within enqueue_timeout
+    503 is returned and telegram retries the update later.
+    """
+
+    def __init__(self,
+                 application: TgApplication,
+                 url_path: str = "/",
+                 secret_token: str | None = None,
+                 enqueue_timeout: float = 10.0):
+        self._application = application
+        self._url_path = "/" + url_path.lstrip("/")
+        self._secret_token = secret_token
+        self._enqueue_timeout = enqueue_timeout
+        self._received = 0
+        self._rejected = 0
+        self._unauthorized = 0
+
+    async def start(self, listen: str, port: int) -> asyncio.Server:
+        return await start_http_server(self.handle, listen, port)
+
+    async def handle(self, request: HttpRequest) -> HttpResponse:
+        if request.path.split("?", 1)[0] != self._url_path:
+            return HttpResponse(HTTPStatus.NOT_FOUND)
+        if request.method != "POST":
+            return HttpResponse(HTTPStatus.METHOD_NOT_ALLOWED)
+        if self._secret_token is not None and not hmac.compare_digest(
+                request.headers.get(SECRET_TOKEN_HEADER, ""), self._secret_token):
+            self._unauthorized += 1
+            return HttpResponse(HTTPStatus.FORBIDDEN)
+        try:
+            data = json.loads(request.body)
+            if not isinstance(data, dict):
+                return HttpResponse(HTTPStatus.BAD_REQUEST)
+            update = Update.de_json(data, self._application.bot)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return HttpResponse(HTTPStatus.BAD_REQUEST)
+        try:
+            await asyncio.wait_for(self._application.update_queue.put(update), self._enqueue_timeout)
+        except TimeoutError:
+            self._rejected += 1
+            return HttpResponse(HTTPStatus.SERVICE_UNAVAILABLE)
+        self._received += 1
+        return HttpResponse(HTTPStatus.OK)
+
+    @property
+    def stats(self) -> WebhookStats:
+        return WebhookStats(
+            received=self._received,
+            rejected=self._rejected,
+            unauthorized=self._unauthorized,
+            queue_size=self._application.update_queue.qsize()
+        )
@@ -0,0 +1,24 @@
+import pytest
+
+from tuican import Application
+from tuican.testing import OfflineRunner
+
+
+@pytest.fixture
+async def offline():
+    """Factory of started OfflineRunners without a rate limiter, stopped after the test."""
+    runners = []
+
+    async def start(screens, configure=None, user_id: int = 1, sessions=None) -> OfflineRunner:
+        application = Application("0:test", screens if isinstance(screens, dict) else {'start': screens}, sessions)
+        application.rate_limiter(None).logging(None)
+        if configure is not None:
+            configure(application)
+        runner = OfflineRunner(application, user_id=user_id)
+        await runner.start()
+        runners.append(runner)
+        return runner
+
+    yield start
+    for runner in runners:
+        await runner.stop()
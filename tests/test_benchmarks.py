@@ -0,0 +1,47 @@
+"""
+Framework overhead per update of the example scenarios of benchmarks.update_overhead.
+
+    pytest tests/test_benchmarks.py --benchmark-only
+
+Without pytest-benchmark the tests are skipped.
+"""
+import asyncio
+import contextlib
+import os
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from benchmarks.update_overhead import SCENARIOS
+from tuican import Application
+from tuican.testing import OfflineRunner, RecordingRequest
+
+
+@pytest.mark.parametrize("name", SCENARIOS)
+def test_update_overhead(benchmark, name):
+    screen, steps = SCENARIOS[name]
+    loop = asyncio.new_event_loop()
+    runner = OfflineRunner(Application("0:benchmark", {'start': screen}).rate_limiter(None).logging(None),
+                           RecordingRequest(record=False))
+    # examples print on clicks
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        loop.run_until_complete(runner.start())
+        try:
+            loop.run_until_complete(runner.send("/start"))
+
+            async def scenario():
+                for step in steps:
+                    await step(runner)
+
+            tracemalloc.start()
+            current, _ = tracemalloc.get_traced_memory()
+            loop.run_until_complete(scenario())
+            benchmark.extra_info["peak_bytes_per_round"] = tracemalloc.get_traced_memory()[1] - current
+            tracemalloc.stop()
+            benchmark.extra_info["updates_per_round"] = len(steps)
+            benchmark(lambda: loop.run_until_complete(scenario()))
+        finally:
+            loop.run_until_complete(runner.stop())
+            loop.close()
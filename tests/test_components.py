@@ -0,0 +1,230 @@
+import asyncio
+import threading
+
+from telegram import InlineKeyboardButton, Update
+
+from tuican.components import Button, PaginatedList, ParametricButton, Screen, ScreenGroup, SharedComponent
+from tuican.components.screen import ScreenDescriptor
+from tuican.deadlines import deadline
+from tuican.execution import ThreadPoolExecution
+from tuican.testing import UpdateFactory
+
+
+def test_parametric_render_delegates_to_render_item():
+    items = ParametricButton(callback_data="item")
+    button = items.render(None, None, "42", "Item 42")
+    assert (button.text, button.callback_data) == ("Item 42", "item:42")
+    assert items.render(None, None, "7").text == "7"
+    assert items.render(None, None).callback_data == "item:"
+
+
+class RoutedScreen(Screen):
+    def __init__(self, components=()):
+        self.pressed = []
+        super().__init__(list(components), "routed")
+
+    def press(self, update, context, callback_data, component):
+        self.pressed.append((component.callback_data, callback_data))
+
+    async def get_layout(self, update, context):
+        return []
+
+
+async def _route(screen, data):
+    return await screen.dispatcher(Update.de_json(UpdateFactory().callback(data, 1), None), None)
+
+
+async def test_index_follows_added_and_deleted_components():
+    screen = RoutedScreen()
+    button = Button("b", callback_data="b", on_change=screen.press)
+    items = ParametricButton(callback_data="item", on_change=screen.press)
+    screen.add_components([button, items])
+    assert await _route(screen, "b") and await _route(screen, "item:1")
+    screen.delete_component(button)
+    screen.delete_component(items)
+    assert not await _route(screen, "b") and not await _route(screen, "item:2")
+    assert screen._callback_index == {} and screen._prefix_index == {}
+    screen.add_component(button)
+    assert await _route(screen, "b")
+    assert screen.pressed == [("b", "b"), ("item", "1"), ("b", "b")]
+
+
+async def test_prefix_routing_across_many_items():
+    screen = RoutedScreen()
+    components = [ParametricButton(callback_data=prefix, on_change=screen.press) for prefix in ("i", "it", "item")]
+    screen.add_components(components)
+    for number in range(2000):
+        assert await _route(screen, f"item:{number}")
+    # the payload may contain the separator, the prefix ends at the first one
+    assert await _route(screen, "it:a:b") and await _route(screen, "i:")
+    assert not await _route(screen, "items:1")
+    assert screen.pressed[0] == ("item", "0") and screen.pressed[1999] == ("item", "1999")
+    assert screen.pressed[2000:] == [("it", "a:b"), ("i", "")]
+
+
+async def test_parametric_button_without_payload_calls_on_change(offline):
+    class ItemsScreen(Screen):
+        def __init__(self):
+            self.items = ParametricButton(callback_data="item", on_change=self.pressed)
+            self.payloads = []
+            super().__init__([self.items], "items")
+
+        def pressed(self, update, context, payload, component):
+            self.payloads.append(payload)
+
+        async def get_layout(self, update, context):
+            return [[self.items.render(update, context), self.items.render(update, context, "1", "one")]]
+
+    runner = await offline(ItemsScreen)
+    await runner.send("/start")
+    await runner.click("item")
+    await runner.click("one")
+    assert runner.application.sessions.get(("start", runner.chat_id)).payloads == ["", "1"]
+
+
+async def test_shared_component_follows_screen_policies(offline):
+    class PooledScreen(Screen):
+        execution = ThreadPoolExecution(max_workers=1)
+        sync_button = SharedComponent(Button("sync", callback_data="sync"), on_change="record_thread")
+        slow_button = SharedComponent(Button("slow", callback_data="slow"), on_change="slow")
+
+        def __init__(self):
+            self.threads = []
+            super().__init__([], "pooled")
+
+        def record_thread(self, update, context, callback_data, component):
+            self.threads.append(threading.current_thread().name)
+
+        @deadline(0.01, "wait")
+        async def slow(self, update, context, callback_data, component):
+            await asyncio.sleep(0.1)
+
+        async def get_layout(self, update, context):
+            return [[self.sync_button.render(update, context), self.slow_button.render(update, context)]]
+
+    runner = await offline(PooledScreen)
+    await runner.send("/start")
+    await runner.click("sync")
+    assert runner.application.sessions.get(("start", runner.chat_id)).threads[0].startswith("tuican-execution")
+    await runner.click("slow")
+    assert runner.request.text_of(runner.chat_id) == "wait"
+    await asyncio.sleep(0.2)
+    assert runner.request.text_of(runner.chat_id) == "pooled"
+    PooledScreen.execution.shutdown()
+
+
+async def test_on_change_of_untracked_state_displays_screen(offline):
+    class CounterScreen(Screen):
+        def __init__(self):
+            self.count = 0
+            self.button = Button("add", on_change=self.add)
+            super().__init__([self.button], "counter")
+
+        def add(self, update, context, callback_data, component):
+            self.count += 1
+
+        async def get_layout(self, update, context):
+            return [[self.button.render(update, context)],
+                    [InlineKeyboardButton(str(self.count), callback_data="count")]]
+
+    runner = await offline(CounterScreen)
+    await runner.send("/start")
+    await runner.click("add")
+    assert runner.request.keyboard_of(runner.chat_id)[1][0]["text"] == "1"
+
+
+def test_paginated_list_has_docstring():
+    assert PaginatedList.__doc__.strip().startswith("List that renders")
+    assert PaginatedList.tracks_changes
+
+
+async def test_paginated_list_refresh_keeps_new_loading_task():
+    release = asyncio.Event()
+
+    async def fetch(offset, limit):
+        await release.wait()
+        return list(range(offset, offset + limit))
+
+    paginated = PaginatedList(fetch)
+    old = paginated._loading_task(0)
+    await asyncio.sleep(0)
+    paginated.refresh()
+    new = paginated._loading_task(0)
+    # the cancelled task finishes after the new one was started
+    await asyncio.gather(old, return_exceptions=True)
+    assert paginated._loading[0] is new
+    release.set()
+    items, has_next = await new
+    assert items == list(range(10)) and has_next
+    assert 0 not in paginated._loading
+
+
+async def test_paginated_list_ignores_malformed_page():
+    async def fetch(offset, limit):
+        return []
+
+    paginated = PaginatedList(fetch)
+    paginated.page = 2
+    await paginated.handle_payload(None, None, "p:stale")
+    assert paginated.page == 2
+
+
+class Page(Screen):
+    def __init__(self, group, number):
+        self.group = group
+        self.number = number
+        self.button = Button(f"page {number}")
+        super().__init__([self.button], f"page {number}")
+
+    async def get_layout(self, update, context):
+        return [[self.button.render(update, context)]]
+
+
+class RebuildablePage(Page):
+    def get_init_args(self):
+        return (self.group, self.number), {}
+
+
+async def test_lazy_stack_rebuilds_only_screens_with_init_args():
+    group = ScreenGroup(Page(None, 0), lazy_stack=True)
+    kept = Page(group, 1)
+    await group.go_to_screen(None, None, kept)
+    await group.go_to_screen(None, None, RebuildablePage(group, 2))
+    await group.go_to_screen(None, None, Page(group, 3))
+    assert [type(screen) for screen in group._screen_stack] == [Page, Page, ScreenDescriptor, Page]
+    await group.go_back(None, None)
+    rebuilt = group._screen_stack[-1]
+    assert (type(rebuilt), rebuilt.number, rebuilt.group) == (RebuildablePage, 2, group)
+    await group.go_back(None, None)
+    assert group._screen_stack[-1] is kept
+    assert not hasattr(kept, "_init_args")
+
+
+class AliasButton(Button):
+    async def handle_callback(self, update, context, callback_data):
+        if callback_data not in (self.callback_data, "alias"):
+            return False
+        await self.click(update, context, callback_data)
+        return True
+
+
+async def test_overridden_handle_callback_is_polled(offline):
+    class AliasScreen(Screen):
+        def __init__(self):
+            self.pressed = []
+            self.button = AliasButton("yes", callback_data="yes", on_change=self.press)
+            super().__init__([self.button], "alias")
+
+        def press(self, update, context, callback_data, component):
+            self.pressed.append(callback_data)
+
+        async def get_layout(self, update, context):
+            return [[self.button.render(update, context)]]
+
+    assert not AliasButton.routed_by_callback_data
+    runner = await offline(AliasScreen)
+    await runner.send("/start")
+    message_id = runner.request.last_message_ids[runner.chat_id]
+    await runner.application.process_update(runner.updates.callback("alias", message_id))
+    await runner.click("yes")
+    assert runner.application.sessions.get(("start", runner.chat_id)).pressed == ["alias", "yes"]
@@ -0,0 +1,34 @@
+import asyncio
+
+from tuican.components import Button, Screen
+from tuican.deadlines import call_handler, deadline
+
+
+class SlowScreen(Screen):
+    def __init__(self):
+        self.button = Button("slow", on_change=self.work)
+        super().__init__([self.button], "idle")
+
+    @deadline(0.01, "busy")
+    async def work(self, update, context, callback_data, component):
+        await asyncio.sleep(0.05)
+        self.message = "worked"
+
+    async def get_layout(self, update, context):
+        return [[self.button.render(update, context)]]
+
+
+class SlowStartScreen(SlowScreen):
+    async def start_handler(self, update, context):
+        await super().start_handler(update, context)
+        await call_handler(self.work, (update, context, "", self.button), self, context)
+
+
+async def test_handler_deferred_by_a_command_is_displayed(offline):
+    runner = await offline(SlowStartScreen)
+    await runner.send("/start")
+    assert runner.request.text_of(runner.chat_id) == "busy"
+    await asyncio.sleep(0.1)
+    assert runner.request.text_of(runner.chat_id) == "worked"
+    assert not runner.application._deferred
+
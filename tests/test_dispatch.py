@@ -0,0 +1,194 @@
+import asyncio
+
+from examples.components_showcase import ComponentsScreen
+from examples.hello_world import MyScreen
+from examples.multiple_screens import AppScreens
+from tuican.components import Button, Screen, render_stats
+from tuican.testing import UpdateFactory
+
+
+async def test_start_sends_screen(offline):
+    runner = await offline(MyScreen)
+    await runner.send("/start")
+    assert runner.request.count("sendMessage") == 1
+    assert [b["text"] for row in runner.request.keyboard_of(runner.chat_id) for b in row] == ["Click me"]
+
+
+async def test_click_edits_message(offline):
+    runner = await offline(MyScreen)
+    await runner.send("/start")
+    await runner.click("Click me")
+    assert runner.request.text_of(runner.chat_id) == "Hello world!"
+    assert runner.request.count("editMessageText") == 1
+    assert runner.request.count("answerCallbackQuery") == 1
+
+
+async def test_unchanged_screen_is_not_edited(offline):
+    runner = await offline(MyScreen)
+    await runner.send("/start")
+    await runner.click("Click me")
+    await runner.click("Click me")
+    assert runner.request.count("editMessageText") == 1
+
+
+async def test_identical_display_is_counted_as_saved(offline):
+    runner = await offline(MyScreen)
+    await runner.send("/start")
+    await runner.click("Click me")
+    saved, sent = render_stats.edits_saved, render_stats.edits_sent
+    await runner.click("Click me")
+    assert (render_stats.edits_saved, render_stats.edits_sent) == (saved + 1, sent)
+
+
+def _edits(runner):
+    return [call.parameters for call in runner.request.calls if call.endpoint == "editMessageText"]
+
+
+async def test_message_edits_the_displayed_message(offline):
+    runner = await offline(ComponentsScreen)
+    await runner.send("/start")
+    message_id = runner.request.last_message_ids[runner.chat_id]
+    await runner.click(3)
+    await runner.send("42")
+    assert runner.request.count("sendMessage") == 1
+    assert _edits(runner)[-1]["chat_id"] == runner.chat_id
+    assert _edits(runner)[-1]["message_id"] == message_id
+
+
+async def test_inline_message_is_edited_by_its_id(offline):
+    runner = await offline(MyScreen)
+    await runner.send("/start")
+    update = runner.updates.callback(runner.request.keyboard_of(runner.chat_id)[0][0]["callback_data"], 0)
+    query = update["callback_query"]
+    del query["message"]
+    query["inline_message_id"] = "inline"
+    await runner.application.process_update(update)
+    assert _edits(runner)[-1]["inline_message_id"] == "inline"
+    assert "chat_id" not in _edits(runner)[-1]
+
+
+async def test_exclusive_checkboxes(offline):
+    runner = await offline(ComponentsScreen)
+    await runner.send("/start")
+    await runner.click("1")
+    await runner.click("2")
+    texts = [b["text"] for b in runner.request.keyboard_of(runner.chat_id)[0]]
+    assert texts == ["1", "✓ 2"]
+    assert runner.request.text_of(runner.chat_id) == "pressed 2"
+
+
+async def test_input_takes_message(offline):
+    runner = await offline(ComponentsScreen)
+    await runner.send("/start")
+    await runner.click(3)
+    await runner.send("42")
+    assert runner.request.keyboard_of(runner.chat_id)[2][0]["text"] == "возраст: 42"
+    assert runner.request.count("deleteMessage") == 1
+
+
+async def test_invalid_input_is_reported(offline):
+    runner = await offline(ComponentsScreen)
+    await runner.send("/start")
+    await runner.click(3)
+    sent = runner.request.count("sendMessage")
+    await runner.send("-5")
+    assert runner.request.count("sendMessage") == sent + 1
+
+
+async def test_screen_group_navigation(offline):
+    runner = await offline(AppScreens)
+    await runner.send("/start")
+    for button, expected in [("Left", "Screen B"), ("Back", "Screen A"), ("Right", "Screen C"),
+                             ("Left", "Screen D"), ("Back", "Screen C"), ("Home", "Screen A")]:
+        await runner.click(button)
+        assert runner.request.text_of(runner.chat_id) == expected, button
+
+
+async def test_users_have_separate_sessions(offline):
+    first = await offline(MyScreen)
+    await first.send("/start")
+    await first.click("Click me")
+    await first.application.process_update(UpdateFactory(user_id=2).message("/start"))
+    assert first.request.text_of(2) == "click the button"
+    assert first.request.text_of(first.chat_id) == "Hello world!"
+
+
+class SlowButtonsScreen(Screen):
+    def __init__(self):
+        self.pressed = []
+        self.buttons = [Button(text, callback_data=text, on_change=self.press) for text in ("a", "b")]
+        super().__init__(self.buttons, "slow")
+
+    async def press(self, update, context, callback_data, component):
+        await asyncio.sleep(0.01)
+        self.pressed.append(callback_data)
+        self.message = " ".join(self.pressed)
+
+    async def get_layout(self, update, context):
+        return [[button.render(update, context) for button in self.buttons]]
+
+
+async def _press_concurrently(runner, *data):
+    message_id = runner.request.last_message_ids[runner.chat_id]
+    await asyncio.gather(*(runner.application.process_update(runner.updates.callback(d, message_id)) for d in data))
+    return runner.application.sessions.get(("start", runner.chat_id)).pressed
+
+
+async def test_concurrent_presses_of_different_buttons_are_applied(offline):
+    runner = await offline(SlowButtonsScreen)
+    await runner.send("/start")
+    assert await _press_concurrently(runner, "a", "b") == ["a", "b"]
+    assert runner.request.count("answerCallbackQuery") == 2
+
+
+async def test_repeated_press_in_flight_is_dropped(offline):
+    runner = await offline(SlowButtonsScreen)
+    await runner.send("/start")
+    assert await _press_concurrently(runner, "a", "a") == ["a"]
+
+
+async def test_debounced_press_keeps_its_place_before_text(offline):
+    runner = await offline(ComponentsScreen, lambda application: application.debounce_callbacks(0.02))
+    await runner.send("/start")
+    await asyncio.gather(runner.click("возраст: 123"), runner.send("42"))
+    assert runner.request.keyboard_of(runner.chat_id)[2][0]["text"] == "возраст: 42"
+
+
+async def test_debounced_presses_after_text_start_a_new_batch(offline):
+    runner = await offline(SlowButtonsScreen, lambda application: application.debounce_callbacks(0.02))
+    await runner.send("/start")
+    message_id = runner.request.last_message_ids[runner.chat_id]
+    screen = runner.application.sessions.get(("start", runner.chat_id))
+    await asyncio.gather(runner.application.process_update(runner.updates.callback("a", message_id)),
+                         runner.send("hello"),
+                         runner.application.process_update(runner.updates.callback("b", message_id)))
+    assert screen.pressed == ["a", "b"]
+    # without the text in between both presses would be displayed by one edit
+    assert runner.request.count("editMessageText") == 2
+
+
+class ReentrancyScreen(SlowButtonsScreen):
+    def __init__(self):
+        self.running = 0
+        self.overlapped = False
+        super().__init__()
+
+    async def press(self, update, context, callback_data, component):
+        self.running += 1
+        self.overlapped |= self.running > 1
+        await super().press(update, context, callback_data, component)
+        self.running -= 1
+
+
+async def test_updates_of_a_user_in_two_chats_are_serialized(offline):
+    runner = await offline(ReentrancyScreen)
+    await runner.send("/start")
+    message_id = runner.request.last_message_ids[runner.chat_id]
+    private = runner.updates.callback("a", message_id)
+    # the same user presses a button of the bot's message in a group
+    group = runner.updates.callback("b", message_id)
+    group["callback_query"]["message"]["chat"] = {"id": -100, "type": "group", "title": "group"}
+    await asyncio.gather(runner.application.process_update(private), runner.application.process_update(group))
+    screen = runner.application.sessions.get(("start", runner.chat_id))
+    assert screen.pressed == ["a", "b"]
+    assert not screen.overlapped
@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+import pytest
+
+from tuican.components import Button, Screen
+from tuican.execution import ExecutionPolicy, PoolExecution, ProcessPoolExecution, ThreadPoolExecution
+
+
+def test_policies_are_abstract():
+    with pytest.raises(TypeError):
+        ExecutionPolicy()
+    with pytest.raises(TypeError):
+        PoolExecution()
+
+
+def test_pool_is_shared_by_event_loops():
+    # created at import time like a policy of a screen class
+    policy = ThreadPoolExecution(max_workers=1)
+
+    async def contend():
+        return await asyncio.gather(policy.run(time.sleep, 0.01), policy.run(lambda: "done"))
+
+    try:
+        assert asyncio.run(contend()) == [None, "done"]
+        assert asyncio.run(contend()) == [None, "done"]
+    finally:
+        policy.shutdown()
+
+
+def test_process_pool_is_rejected_for_on_change():
+    policy = ProcessPoolExecution(max_workers=1)
+    button = Button("b")
+    with pytest.raises(TypeError):
+        button.execution = policy
+    assert button.execution is None
+    with pytest.raises(TypeError):
+        class ProcessScreen(Screen):
+            execution = policy
+
+    class ValidationScreen(Screen):
+        execution = ThreadPoolExecution(max_workers=1)
+        validation_execution = policy
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+from telegram.ext import ApplicationBuilder
+
+from tuican.httpserver import HttpRequest, HttpResponse, start_http_server
+from tuican.webhook import WebhookServer
+
+
+async def _handler(request: HttpRequest) -> HttpResponse:
+    if request.path == "/fail":
+        raise RuntimeError("handler failed")
+    return HttpResponse(body=b"ok")
+
+
+async def _exchange(server: asyncio.Server, data: bytes) -> bytes:
+    reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+    writer.write(data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+async def _status(data: bytes, **limits) -> int:
+    server = await start_http_server(_handler, "127.0.0.1", 0, **limits)
+    try:
+        return int((await asyncio.wait_for(_exchange(server, data), 5)).split(b" ", 2)[1])
+    finally:
+        server.close()
+
+
+async def test_request_is_answered():
+    assert await _status(b"GET / HTTP/1.1\r\nConnection: close\r\n\r\n") == 200
+
+
+async def test_failed_handler_answers_500():
+    assert await _status(b"GET /fail HTTP/1.1\r\n\r\n") == 500
+
+
+async def test_headers_are_limited():
+    headers = b"".join(b"X-%d: 1\r\n" % i for i in range(20))
+    assert await _status(b"GET / HTTP/1.1\r\n" + headers + b"\r\n", max_headers=10) == 431
+    assert await _status(b"GET / HTTP/1.1\r\nX-Long: " + b"a" * 2048 + b"\r\n\r\n", max_header_size=1024) == 431
+    assert await _status(b"GET /" + b"a" * 2048 + b" HTTP/1.1\r\n\r\n", max_header_size=1024) == 431
+
+
+async def test_invalid_content_length_answers_400():
+    assert await _status(b"POST / HTTP/1.1\r\nContent-Length: -1\r\n\r\n") == 400
+
+
+async def test_large_body_answers_413():
+    assert await _status(b"POST / HTTP/1.1\r\nContent-Length: 2048\r\n\r\n", max_body_size=1024) == 413
+
+
+async def test_webhook_rejects_json_that_is_no_update():
+    webhook = WebhookServer(ApplicationBuilder().token("0:test").build())
+    for body in (b"[]", b"1", b"null", json.dumps({"update_id": 1, "message": 5}).encode()):
+        response = await webhook.handle(HttpRequest("POST", "/", {}, body))
+        assert response.status == 400
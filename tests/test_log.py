@@ -0,0 +1,34 @@
+import logging
+
+from tuican.log import SamplingFilter
+
+
+def _record(error: str, level: int = logging.WARNING) -> logging.LogRecord:
+    return logging.makeLogRecord({"name": "tuican", "levelno": level, "levelname": logging.getLevelName(level),
+                                  "msg": "message not sent", "error": error})
+
+
+def test_sampling_filter_suppresses_bursts_per_error():
+    now = [0.0]
+    sampler = SamplingFilter(burst=2, interval=10, clock=lambda: now[0])
+    assert [sampler.filter(_record("BadRequest")) for _ in range(5)] == [True, True, False, False, False]
+    # other error classes and records below WARNING have their own budget
+    assert sampler.filter(_record("TimedOut"))
+    assert sampler.filter(_record("BadRequest", logging.INFO))
+    now[0] = 10
+    passed = _record("BadRequest")
+    assert sampler.filter(passed)
+    assert passed.suppressed == 3
+
+
+def test_sampling_filter_summarizes_suppressed_records():
+    now = [0.0]
+    sampler = SamplingFilter(burst=1, interval=10, clock=lambda: now[0])
+    for _ in range(3):
+        sampler.filter(_record("BadRequest"))
+    assert sampler.summaries() == []
+    now[0] = 10
+    [summary] = sampler.summaries()
+    assert summary.suppressed == 2
+    assert summary.getMessage() == "2 similar records suppressed, last: message not sent"
+    assert sampler.summaries(force=True) == []
@@ -0,0 +1,22 @@
+from examples.hello_world import MyScreen
+from tuican.httpserver import HttpRequest
+from tuican.metrics import DISPATCH_SECONDS, metrics
+
+
+async def test_metrics_are_exposed(offline):
+    runner = await offline(MyScreen, lambda application: application.metrics())
+    try:
+        await runner.send("/start")
+        await runner.click("Click me")
+        snapshot = metrics.snapshot()
+        assert snapshot[DISPATCH_SECONDS][("MyScreen", "callback")].count == 1
+        response = await metrics.handle(HttpRequest("GET", "/metrics", {}, b""))
+        text = response.body.decode()
+        assert "# TYPE tuican_dispatch_seconds histogram" in text
+        assert 'tuican_dispatch_seconds_bucket{screen="MyScreen",kind="callback",le="+Inf"} 1' in text
+        assert 'tuican_bot_api_seconds_count{method="editMessageText"} 1' in text
+        assert 'tuican_edits_total{result="sent"}' in text
+        assert (await metrics.handle(HttpRequest("GET", "/other", {}, b""))).status == 404
+    finally:
+        metrics.enabled = False
+        metrics.reset()
@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+from telegram import InlineKeyboardButton
+
+from tuican import Application
+from tuican.components import Button, Screen
+from tuican.outbound import OutboundScheduler
+from tuican.testing import OfflineRunner, RecordingRequest
+
+
+class CounterScreen(Screen):
+    def __init__(self):
+        self.count = 0
+        self.button = Button("add", on_change=self.add)
+        self.redisplay = Button("redisplay", on_change=lambda *args: None)
+        super().__init__([self.button, self.redisplay], "counter")
+
+    def add(self, update, context, callback_data, component):
+        self.count += 1
+
+    async def get_layout(self, update, context):
+        return [[self.button.render(update, context), self.redisplay.render(update, context)],
+                [InlineKeyboardButton(str(self.count), callback_data="count")]]
+
+
+class FailingEditsRequest(RecordingRequest):
+    def __init__(self):
+        super().__init__()
+        self.fail_edits = False
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        if self.fail_edits and url.endswith("/editMessageText"):
+            return 400, json.dumps({"ok": False, "error_code": 400,
+                                    "description": "Bad Request: message to edit not found"}).encode()
+        return await super().do_request(url, method, request_data, *args, **kwargs)
+
+
+async def test_edits_waiting_for_a_slot_are_coalesced(offline):
+    scheduler = OutboundScheduler(chat_rate=10, burst=1)
+    runner = await offline(CounterScreen, lambda application: application.rate_limiter(scheduler)
+                           .acknowledge_callbacks(drop_duplicates=False))
+    await runner.send("/start")
+    await asyncio.wait_for(asyncio.gather(*(runner.click("add") for _ in range(8))), 1)
+    await scheduler.shutdown()
+    assert scheduler.stats.coalesced > 0
+    assert runner.request.count("editMessageText") < 8
+    # the latest content is sent
+    assert runner.request.keyboard_of(runner.chat_id)[1][0]["text"] == "8"
+
+
+async def test_failed_queued_edit_is_sent_again():
+    scheduler = OutboundScheduler(chat_rate=20, burst=1)
+    request = FailingEditsRequest()
+    runner = OfflineRunner(Application("0:test", {"start": CounterScreen}).rate_limiter(scheduler).logging(None),
+                           request)
+    await runner.start()
+    try:
+        await runner.send("/start")
+        request.fail_edits = True
+        # waits for the slot taken by the sent message, so it is queued and fails later
+        await runner.click("add")
+        await scheduler.shutdown()
+        request.fail_edits = False
+        await asyncio.sleep(0.06)
+        # the same content as the failed edit
+        await runner.click("redisplay")
+        assert runner.request.keyboard_of(runner.chat_id)[1][0]["text"] == "1"
+    finally:
+        await runner.stop()
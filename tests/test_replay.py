@@ -0,0 +1,28 @@
+from examples.components_showcase import ComponentsScreen
+from tuican import Application
+from tuican.journal import UpdateJournal
+from tuican.replay import replay
+from tuican.testing import OfflineRunner, RecordingRequest
+
+
+def _application() -> Application:
+    return Application("0:test", {'start': ComponentsScreen}).rate_limiter(None).logging(None)
+
+
+async def test_replayed_clicks_reach_their_buttons(tmp_path):
+    path = str(tmp_path / "updates.jsonl")
+    runner = OfflineRunner(_application().journal(UpdateJournal(path)))
+    await runner.start()
+    await runner.send("/start")
+    await runner.click("1")
+    await runner.click("2")
+    await runner.stop()
+    expected = runner.request.keyboard_of(runner.chat_id)
+
+    # components of the replayed screens get other generated ids
+    request = RecordingRequest()
+    stats = await replay(_application(), path, request=request)
+    assert stats.updates == 3
+    assert request.text_of(runner.chat_id) == "pressed 2"
+    assert [[b["text"] for b in row] for row in request.keyboard_of(runner.chat_id)] == \
+           [[b["text"] for b in row] for row in expected]
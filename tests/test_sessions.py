@@ -0,0 +1,187 @@
+import asyncio
+import sys
+
+import pytest
+
+from examples.components_showcase import ComponentsScreen
+from examples.hello_world import MyScreen
+from examples.multiple_screens import AppScreens
+from examples.paginated_list import RowsScreen
+from tuican.components import Button, Screen, SharedComponent
+from tuican.session import InMemoryKeyValueClient, KeyValueSessionStore, MemorySessionStore, PickleSerializer, \
+    SQLiteSessionStore, SessionCache, SessionPersistence, estimate_size
+from tuican.testing import UpdateFactory
+
+
+async def test_evicted_user_gets_fresh_screen_on_click(offline):
+    runner = await offline(MyScreen, sessions=SessionCache(max_entries=1))
+    await runner.send("/start")
+    await runner.application.process_update(UpdateFactory(user_id=2).message("/start"))
+    assert len(runner.application.sessions) == 1
+    edits = runner.request.count("editMessageText")
+    await runner.click("Click me")
+    assert runner.request.count("editMessageText") == edits + 1
+    assert runner.request.text_of(runner.chat_id) == "click the button"
+    # the fresh screen's buttons work
+    await runner.click("Click me")
+    assert runner.request.text_of(runner.chat_id) == "Hello world!"
+
+
+class CountingScreen(Screen):
+    def __init__(self):
+        self.presses = 0
+        self.button = Button("press", callback_data="press", on_change=self.press)
+        super().__init__([self.button], "pressed 0")
+
+    def press(self, update, context, callback_data, component):
+        self.presses += 1
+        self.message = f"pressed {self.presses}"
+
+    async def get_layout(self, update, context):
+        return [[self.button.render(update, context)]]
+
+
+async def test_stale_callback_is_not_dispatched_to_fresh_screen(offline):
+    runner = await offline(CountingScreen, sessions=SessionCache(max_entries=1))
+    await runner.send("/start")
+    await runner.application.process_update(UpdateFactory(user_id=2).message("/start"))
+    edits = runner.request.count("editMessageText")
+    # the button has the same callback data on the fresh screen
+    await runner.click("press")
+    assert runner.application.sessions.get(("start", runner.chat_id)).presses == 0
+    assert runner.request.count("editMessageText") == edits + 1
+    assert runner.request.text_of(runner.chat_id) == "pressed 0"
+    await runner.click("press")
+    assert runner.request.text_of(runner.chat_id) == "pressed 1"
+
+
+async def test_session_expired_during_lookup_is_displayed(offline):
+    now = [0.0]
+    runner = await offline(MyScreen, sessions=SessionCache(ttl=10, clock=lambda: now[0]))
+    await runner.send("/start")
+    now[0] = 100
+    await runner.click("Click me")
+    assert runner.request.count("editMessageText") == 1
+    await runner.click("Click me")
+    assert runner.request.text_of(runner.chat_id) == "Hello world!"
+
+
+async def test_commands_are_evicted_with_sessions(offline):
+    runner = await offline(MyScreen, sessions=SessionCache(max_entries=2))
+    for user_id in range(2, 12):
+        await runner.application.process_update(UpdateFactory(user_id=user_id).message("/start"))
+    assert len(runner.application.sessions) == 2
+    assert len(runner.application._commands) == 2
+
+
+async def test_session_size_is_measured_after_display(offline):
+    runner = await offline(MyScreen, sessions=SessionCache(max_bytes=1 << 30))
+    await runner.send("/start")
+    await runner.click("Click me")
+    screen = runner.application.sessions.get(("start", runner.chat_id))
+    assert runner.application.sessions.stats.resident_bytes == estimate_size(screen)
+
+
+async def test_memory_budget_uses_displayed_sizes(offline):
+    probe = await offline(MyScreen)
+    await probe.send("/start")
+    size = estimate_size(probe.application.sessions.get(("start", probe.chat_id)))
+    # room for two displayed sessions, the third one evicts the oldest
+    runner = await offline(MyScreen, sessions=SessionCache(max_bytes=int(size * 2.5)))
+    for user_id in range(1, 4):
+        await runner.application.process_update(UpdateFactory(user_id=user_id).message("/start"))
+    assert len(runner.application.sessions) == 2
+    assert ("start", 1) not in runner.application.sessions
+
+
+def test_rendered_buttons_are_counted():
+    screen = MyScreen()
+    before = estimate_size(screen)
+    screen.button.render(None, None)
+    assert estimate_size(screen) > before
+
+
+async def test_size_estimate_stops_at_shared_objects():
+    shared = SharedComponent(Button("shared", callback_data="shared"))
+    objects = [asyncio.get_running_loop(), asyncio.current_task(), asyncio.Lock(), shared, shared.component]
+    assert estimate_size(objects) == sys.getsizeof(objects)
+
+
+def test_size_estimate_is_bounded():
+    nested = []
+    for _ in range(100):
+        nested = [nested]
+    assert estimate_size(nested, max_depth=10) == 11 * sys.getsizeof([[]])
+    assert estimate_size(list(range(1000)), max_objects=10) < estimate_size(list(range(1000)))
+
+
+async def test_sessions_are_measured_only_after_display(offline):
+    measured = []
+
+    def sizeof(screen):
+        measured.append(screen)
+        return 1
+
+    runner = await offline(MyScreen, sessions=SessionCache(max_bytes=1 << 30, sizeof=sizeof))
+    await runner.send("/start")
+    count = len(measured)
+    # a text message isn't handled by the screen, it isn't displayed
+    await runner.send("hello")
+    assert len(measured) == count
+    await runner.click("Click me")
+    assert len(measured) == count + 1
+
+
+def test_example_screens_can_be_persisted():
+    serializer = PickleSerializer()
+    for factory in (ComponentsScreen, MyScreen, AppScreens, RowsScreen):
+        serializer.dumps(factory())
+
+
+async def test_persistence_fails_on_screens_that_cant_be_pickled(offline):
+    class LambdaScreen(Screen):
+        def __init__(self):
+            super().__init__([Button("add", on_change=lambda *args: None)], "lambda")
+
+        async def get_layout(self, update, context):
+            return []
+
+    with pytest.raises(TypeError, match="/start"):
+        await offline(LambdaScreen, lambda application: application.persistence(
+            SessionPersistence(MemorySessionStore())))
+
+
+@pytest.mark.parametrize("store", ["sqlite", "key_value"])
+async def test_store_round_trip(store, tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db")) if store == "sqlite" \
+        else KeyValueSessionStore(InMemoryKeyValueClient())
+    await store.put_many({"a": b"1", "b": b"2"})
+    await store.put_many({"a": b"3"})
+    assert (await store.get("a"), await store.get("b"), await store.get("c")) == (b"3", b"2", None)
+    await store.delete_many(["a", "c"])
+    assert (await store.get("a"), await store.get("b")) == (None, b"2")
+    await store.close()
+
+
+async def test_sessions_are_written_behind_and_restored(offline, tmp_path):
+    path = str(tmp_path / "sessions.db")
+    persistence = SessionPersistence(SQLiteSessionStore(path), flush_interval=60)
+    first = await offline(MyScreen, lambda application: application.persistence(persistence))
+    await first.send("/start")
+    await first.click("Click me")
+    reader = SQLiteSessionStore(path)
+    # nothing is written until the flush
+    assert await reader.get(f"screen:start:{first.chat_id}") is None
+    assert persistence.pending == 2
+    await persistence.flush()
+    assert persistence.pending == 0
+    assert await reader.get(f"command:{first.chat_id}") == b"start"
+    await reader.close()
+
+    # a restarted bot continues the session from the store
+    second = await offline(MyScreen, lambda application: application.persistence(
+        SessionPersistence(SQLiteSessionStore(path))))
+    data = first.request.keyboard_of(first.chat_id)[0][0]["callback_data"]
+    message_id = first.request.last_message_ids[first.chat_id]
+    await second.application.process_update(second.updates.callback(data, message_id))
+    assert second.application.sessions.get(("start", second.chat_id)).message == "Hello world!"
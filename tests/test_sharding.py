@@ -0,0 +1,33 @@
+import asyncio
+
+from tuican.sharding import HashRing, ShardedApplication
+
+
+class StuckProcess:
+    def __init__(self):
+        self.alive = True
+        self.joins = []
+
+    def join(self, timeout=None):
+        self.joins.append(timeout)
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+    def terminate(self):
+        self.alive = False
+
+
+def test_hash_ring_is_stable():
+    ring = HashRing(4)
+    assert [ring.shard_for(user) for user in range(100)] == [HashRing(4).shard_for(user) for user in range(100)]
+    assert set(ring.shard_for(user) for user in range(1000)) == {0, 1, 2, 3}
+
+
+async def test_stuck_worker_with_full_queue_is_terminated():
+    application = ShardedApplication("0:test", {}, workers=1, queue_size=1, shutdown_timeout=0.05).logging(None)
+    application._queues[0].put("update")
+    process = application._processes[0] = StuckProcess()
+    await asyncio.wait_for(application._on_post_shutdown(None), 5)
+    assert not process.alive
+    assert process.joins == [0.05, None]